@@ -0,0 +1,36 @@
+"""
+Benchmark the Monte Carlo equity simulation behind /analytics/simulate.
+
+Run from the backend/ directory:
+    python benchmarks/bench_simulation.py [num_paths]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.simulation import simulate_equity
+
+
+def main():
+    n_paths = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    # A long history: 5000 closed trades with a small positive edge
+    returns = np.random.default_rng(42).normal(0.003, 0.03, 5000)
+
+    print(f"paths: {n_paths}, history: {returns.size} trades")
+    for horizon in (100, 250, 500):
+        start = time.perf_counter()
+        result = simulate_equity(returns, n_paths=n_paths, horizon=horizon, seed=1)
+        elapsed = time.perf_counter() - start
+        print(
+            f"horizon {horizon:4d}: {elapsed * 1000:8.1f} ms  "
+            f"risk of ruin {result['risk_of_ruin'] * 100:5.2f}%  "
+            f"median max drawdown {result['max_drawdown']['p50'] * 100:5.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark GET /trades serialization: per-row TradeResponse models + FastAPI's
+default encoder (before) vs bulk TypeAdapter validation + direct JSON encoding (after).
+
+Run from the backend/ directory:
+    python benchmarks/bench_trades_serialization.py [num_trades]
+"""
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from models.trade_model import TradeResponse, TradeListAdapter
+from utils.http import brotli, BROTLI_QUALITY, GZIP_LEVEL
+
+
+def _make_trades(n: int):
+    """Generate synthetic Supabase rows with realistic ai_feedback sizes"""
+    rng = random.Random(42)
+    tickers = ["AAPL", "TSLA", "NVDA", "SPY", "QQQ", "AMD", "MSFT", "META"]
+    setups = ["breakout", "pullback", "reversal", "gap and go", None]
+    feedback = " ".join(["The entry was well timed relative to the opening range."] * 40)
+    start = date(2023, 1, 1)
+    trades = []
+    for i in range(n):
+        entry = round(rng.uniform(10, 500), 2)
+        trades.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "user_id": None,
+            "ticker": rng.choice(tickers),
+            "entry": entry,
+            "exit": round(entry * rng.uniform(0.9, 1.1), 2),
+            "direction": rng.choice(["long", "short"]),
+            "setup": rng.choice(setups),
+            "notes": "Followed the plan, sized down after two losses.",
+            "tags": ["momentum", "a+"],
+            "date": (start + timedelta(days=i % 700)).isoformat(),
+            "created_at": "2024-01-01T00:00:00",
+            "ai_feedback": feedback,
+        })
+    return trades
+
+
+def _before(trades) -> bytes:
+    models = [TradeResponse(**trade) for trade in trades]
+    return json.dumps(jsonable_encoder(models)).encode("utf-8")
+
+
+def _after(trades) -> bytes:
+    return TradeListAdapter.dump_json(TradeListAdapter.validate_python(trades))
+
+
+def _time(fn, *args, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    trades = _make_trades(n)
+
+    before_s = _time(_before, trades)
+    after_s = _time(_after, trades)
+    body = _after(trades)
+
+    print(f"trades:            {n}")
+    print(f"before (models):   {before_s * 1000:8.2f} ms")
+    print(f"after (adapter):   {after_s * 1000:8.2f} ms  ({before_s / after_s:.1f}x)")
+    print(f"json body:         {len(body) / 1024:8.1f} KiB")
+    print(f"gzip body:         {len(gzip.compress(body, compresslevel=GZIP_LEVEL)) / 1024:8.1f} KiB")
+    if brotli is not None:
+        print(f"brotli body:       {len(brotli.compress(body, quality=BROTLI_QUALITY)) / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
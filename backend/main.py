@@ -19,7 +19,8 @@ print("SUPABASE_ANON_KEY:", os.getenv("SUPABASE_ANON_KEY"))
 # IMPORT ROUTES AFTER ENV LOAD
 # ============================
 # Import routes after environment is loaded to ensure services can access env vars
-from routes import trades, ai, chat, settings
+from routes import trades, ai, chat, settings, analytics, admin
+from utils.profiling import ProfilingMiddleware, profiling_enabled, profiling_requested
 
 # ============================
 # FASTAPI APP
@@ -38,13 +39,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id", "X-Change-Seq"],
 )
 
+# Opt-in request profiling (PROFILING_ENABLED=1 plus PROFILING_TOKEN); captured
+# profiles are served under /admin
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+elif profiling_requested():
+    print("Warning: PROFILING_ENABLED is set but PROFILING_TOKEN is not; request profiling stays disabled")
+
 # Routers
 app.include_router(trades.router)
 app.include_router(ai.router)
 app.include_router(chat.router)
 app.include_router(settings.router)
+app.include_router(analytics.router)
+app.include_router(admin.router)
 
 @app.get("/health")
 async def health_check():
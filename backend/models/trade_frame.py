@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.profiling import timed
+
+
+def _encode(values: List[Optional[str]], missing: Optional[str]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Dictionary-encode a column of strings.
+
+    Categories are numbered in order of first appearance. None maps to `missing`
+    when given, otherwise to code -1.
+    """
+    codes = np.empty(len(values), dtype=np.int32)
+    lookup: Dict[str, int] = {}
+    categories: List[str] = []
+    for i, value in enumerate(values):
+        if value is None:
+            if missing is None:
+                codes[i] = -1
+                continue
+            value = missing
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(categories)
+            categories.append(value)
+        codes[i] = code
+    return codes, categories
+
+
+class TradeFrame:
+    """
+    Columnar view of a list of trades for analytics.
+
+    Prices are float64 arrays (NaN for open trades), direction is +1/-1 int8,
+    dates are datetime64[D], and ticker and setup are dictionary-encoded int32
+    codes into small category lists. Built once per fetch, so aggregations run
+    as array operations instead of per-row dict lookups.
+    """
+
+    __slots__ = ("ids", "entry", "exit", "direction", "date", "ticker_codes", "tickers", "setup_codes", "setups")
+
+    UNKNOWN_SETUP = "Unknown"
+
+    def __init__(
+        self,
+        ids: List[str],
+        entry: np.ndarray,
+        exit: np.ndarray,
+        direction: np.ndarray,
+        date: np.ndarray,
+        ticker_codes: np.ndarray,
+        tickers: List[str],
+        setup_codes: np.ndarray,
+        setups: List[str],
+    ):
+        self.ids = ids
+        self.entry = entry
+        self.exit = exit
+        self.direction = direction
+        self.date = date
+        self.ticker_codes = ticker_codes
+        self.tickers = tickers
+        self.setup_codes = setup_codes
+        self.setups = setups
+
+    @classmethod
+    @timed("analytics.trade_frame")
+    def from_trades(cls, trades: List[Dict]) -> "TradeFrame":
+        """
+        Build a frame from trade dictionaries in a single pass.
+
+        Args:
+            trades: Trades as returned by SupabaseService
+
+        Returns:
+            TradeFrame: Columnar representation, rows in the same order
+        """
+        n = len(trades)
+        entry = np.empty(n)
+        exit_price = np.empty(n)
+        direction = np.empty(n, dtype=np.int8)
+        dates, tickers, setups, ids = [], [], [], []
+
+        for i, trade in enumerate(trades):
+            value = trade.get("entry")
+            entry[i] = np.nan if value is None else value
+            value = trade.get("exit")
+            exit_price[i] = np.nan if value is None else value
+            direction[i] = -1 if trade.get("direction") == "short" else 1
+            dates.append(trade.get("date"))
+            tickers.append(trade.get("ticker"))
+            setups.append(trade.get("setup") or None)
+            ids.append(str(trade["id"]) if trade.get("id") is not None else None)
+
+        ticker_codes, ticker_categories = _encode(tickers, None)
+        setup_codes, setup_categories = _encode(setups, cls.UNKNOWN_SETUP)
+
+        return cls(
+            ids=ids,
+            entry=entry,
+            exit=exit_price,
+            direction=direction,
+            date=np.array(dates, dtype="datetime64[D]"),
+            ticker_codes=ticker_codes,
+            tickers=ticker_categories,
+            setup_codes=setup_codes,
+            setups=setup_categories,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def closed(self) -> np.ndarray:
+        """Boolean mask of trades with both an entry and an exit price"""
+        return ~(np.isnan(self.entry) | np.isnan(self.exit))
+
+    def pnl(self) -> np.ndarray:
+        """Direction-adjusted P&L per share (NaN for open trades)"""
+        return self.direction * (self.exit - self.entry)
+
+    def returns(self) -> np.ndarray:
+        """Direction-adjusted fractional return per trade (NaN for open trades)"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.pnl() / self.entry
+
+    def closed_returns(self) -> np.ndarray:
+        """Fractional returns of closed trades only"""
+        mask = self.closed & (self.entry != 0)
+        return self.returns()[mask]
+
+    def setup_stats(self) -> List[Dict]:
+        """
+        Wins, losses and total P&L per setup, over closed trades.
+
+        A trade with zero P&L counts as a loss. Setups are listed in order of first
+        appearance.
+        """
+        mask = self.closed
+        pnl = self.pnl()[mask]
+        codes = self.setup_codes[mask]
+        size = len(self.setups)
+        wins = np.bincount(codes, weights=pnl > 0, minlength=size)
+        counts = np.bincount(codes, minlength=size)
+        totals = np.bincount(codes, weights=pnl, minlength=size)
+        return [
+            {
+                "setup": setup,
+                "wins": int(wins[code]),
+                "losses": int(counts[code] - wins[code]),
+                "pnl": float(totals[code]),
+            }
+            for code, setup in enumerate(self.setups)
+            if counts[code]
+        ]
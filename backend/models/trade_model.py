@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, field_validator, ConfigDict
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator, ConfigDict, TypeAdapter
+from typing import Optional, List, Dict
 from datetime import date
 from uuid import UUID
 
@@ -45,10 +45,55 @@ class TradeUpdate(BaseModel):
         return v.lower() if v else v
 
 
+class TradeFeedback(BaseModel):
+    """Structured AI feedback for a trade, one field per section"""
+    execution: str = Field("", description="Trade execution: was the entry/exit timing good, and why or why not")
+    setup: str = Field("", description="Setup quality: was it high probability, with its strengths and weaknesses")
+    risk: str = Field("", description="Risk management: position sizing and risk/reward")
+    psychology: str = Field("", description="Psychological factors that may have influenced the trade (fear, greed, FOMO, etc.)")
+    went_well: str = Field("", description="Positive aspects of the trade")
+    improvements: str = Field("", description="Specific, actionable improvements")
+    takeaways: str = Field("", description="2-3 main lessons from the trade")
+
+    model_config = ConfigDict(extra="ignore")
+
+
+FEEDBACK_SECTIONS = tuple(TradeFeedback.model_fields)
+
+# Sections whose content depends on each trade field, used to regenerate only
+# what an edit affects. The summary sections depend on everything.
+_SUMMARY_SECTIONS = ("went_well", "improvements", "takeaways")
+FEEDBACK_SECTION_DEPENDENCIES = {
+    "ticker": FEEDBACK_SECTIONS,
+    "entry": ("execution", "risk") + _SUMMARY_SECTIONS,
+    "exit": ("execution", "risk") + _SUMMARY_SECTIONS,
+    "direction": ("execution", "risk") + _SUMMARY_SECTIONS,
+    "setup": ("setup",) + _SUMMARY_SECTIONS,
+    "notes": ("execution", "psychology") + _SUMMARY_SECTIONS,
+    "tags": ("setup", "psychology") + _SUMMARY_SECTIONS,
+    "date": ("execution",),
+}
+
+
+def affected_feedback_sections(changed_fields) -> List[str]:
+    """Feedback sections that must be regenerated after the given trade fields change"""
+    affected = set()
+    for field in changed_fields:
+        affected.update(FEEDBACK_SECTION_DEPENDENCIES.get(field, ()))
+    return [name for name in FEEDBACK_SECTIONS if name in affected]
+
+
 class TradeResponse(TradeBase):
     id: UUID
     user_id: Optional[str]
     created_at: str
     ai_feedback: Optional[str]
+    ai_feedback_sections: Optional[Dict[str, str]] = None
+    ai_feedback_version: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# Bulk validator/serializer for trade lists: validates every row in a single
+# pydantic-core call and encodes straight to JSON bytes
+TradeListAdapter = TypeAdapter(List[TradeResponse])
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+
+from utils.profiling import profile_store, profiling_enabled, token_matches
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def _authorize(token: Optional[str]):
+    """Raise unless profiling is enabled (which requires PROFILING_TOKEN) and the token matches"""
+    if not profiling_enabled():
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not token_matches(token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+@router.get("/profiles")
+async def list_profiles(x_profiling_token: Optional[str] = Header(None)):
+    """
+    List captured request profiles, newest first.
+
+    - Profiles are captured for requests slower than PROFILING_SLOW_MS or sent with X-Debug-Profile
+    - Only the most recent profiles are kept
+    """
+    _authorize(x_profiling_token)
+    return {"profiles": [profile.summary() for profile in profile_store.list()]}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: int,
+    format: str = Query("json", pattern="^(json|folded)$", description="json, or folded stacks for flame graph tools"),
+    x_profiling_token: Optional[str] = Header(None),
+):
+    """
+    Get one captured profile.
+
+    - Per-stage timings for the Supabase, Groq and AI service calls made by the request
+    - Hottest functions from stack samples of the request's worker thread
+    - ?format=folded returns the samples as collapsed stacks
+    - Returns 404 if the profile has been evicted
+    """
+    _authorize(x_profiling_token)
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(profile.folded_stacks())
+    return profile.to_dict()
+
+
+@router.delete("/profiles", status_code=204)
+async def clear_profiles(x_profiling_token: Optional[str] = Header(None)):
+    """Discard all captured profiles"""
+    _authorize(x_profiling_token)
+    profile_store.clear()
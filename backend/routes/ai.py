@@ -1,36 +1,56 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List, Optional
 
 from services.supabase_service import SupabaseService
 from services.ai_service import AIService
-from models.trade_model import TradeResponse
+from models.trade_model import TradeResponse, FEEDBACK_SECTIONS
+from utils.profiling import ProfiledRoute
 
-router = APIRouter(prefix="/ai", tags=["ai"])
+router = APIRouter(prefix="/ai", tags=["ai"], route_class=ProfiledRoute)
 
 supabase_service = SupabaseService()
 ai_service = AIService()
 
 
+def _validate_sections(sections):
+    """Raise a 400 unless sections is a non-empty list of known feedback sections"""
+    if not isinstance(sections, list) or not sections:
+        raise HTTPException(status_code=400, detail="sections must be a non-empty list")
+    unknown = set(sections) - set(FEEDBACK_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown feedback sections: {', '.join(sorted(map(str, unknown)))}")
+
+
 @router.post("/analyze")
-async def analyze_trade(request: Dict):
-    """Analyze a single trade"""
+def analyze_trade(request: Dict):
+    """
+    Analyze a single trade.
+    
+    - Optional "sections" list regenerates only those sections and keeps the rest
+    """
     try:
         trade_id = request.get("trade_id")
         if not trade_id:
             raise HTTPException(status_code=400, detail="trade_id is required")
         
+        sections = request.get("sections")
+        if sections is not None:
+            _validate_sections(sections)
+        
         trade = supabase_service.get_trade_by_id(trade_id)
         if not trade:
             raise HTTPException(status_code=404, detail="Trade not found")
         
-        analysis = ai_service.analyze_trade(trade)
+        analysis = ai_service.refresh_feedback(trade, sections)
         
         # Update the trade with the new analysis
-        supabase_service.update_ai_feedback(trade_id, analysis)
+        version = ai_service.prompt_version("trade_analysis")
+        supabase_service.update_ai_feedback(trade_id, analysis, version)
         
         return {
             "trade_id": trade_id,
-            "analysis": analysis
+            "analysis": analysis,
+            "version": version
         }
     except HTTPException:
         raise
@@ -38,12 +58,44 @@ async def analyze_trade(request: Dict):
         raise HTTPException(status_code=500, detail=f"Error analyzing trade: {str(e)}")
 
 
+@router.get("/feedback/{trade_id}")
+def get_feedback(
+    trade_id: str,
+    sections: Optional[List[str]] = Query(None, description="Sections to return (default: all)"),
+):
+    """
+    Get a trade's stored AI feedback, optionally only some sections.
+    
+    - e.g. /ai/feedback/{trade_id}?sections=takeaways
+    - Returns 404 if the trade is not found
+    """
+    if sections is not None:
+        _validate_sections(sections)
+    try:
+        trade = supabase_service.get_trade_by_id(trade_id)
+        if not trade:
+            raise HTTPException(status_code=404, detail="Trade not found")
+        
+        feedback = trade.get("ai_feedback_sections") or {}
+        return {
+            "trade_id": trade_id,
+            "version": trade.get("ai_feedback_version"),
+            "sections": {name: text for name, text in feedback.items() if sections is None or name in sections}
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching feedback: {str(e)}")
+
+
 @router.get("/insights")
-async def get_insights():
+def get_insights():
     """Get comprehensive insights from all trades"""
     try:
+        data_version = supabase_service.data_version
         trades = supabase_service.get_all_trades()
-        insights = ai_service.analyze_full_history(trades)
+        frame = supabase_service.get_trade_frame(trades, data_version)
+        insights = ai_service.analyze_full_history(trades, data_version, frame)
         
         return {
             "total_trades": len(trades),
@@ -51,3 +103,14 @@ async def get_insights():
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating insights: {str(e)}")
+
+
+@router.get("/prompts")
+async def get_prompts():
+    """
+    Report prompt templates with their versions, token budgets and token usage.
+    
+    Stored feedback whose ai_feedback_version differs from the active
+    trade_analysis version was produced by an older prompt.
+    """
+    return {"prompts": ai_service.prompts.report()}
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+
+from services.supabase_service import SupabaseService
+from services.simulation import simulate_equity
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/analytics", tags=["analytics"], route_class=ProfiledRoute)
+
+supabase_service = SupabaseService()
+
+
+@router.get("/simulate")
+def simulate(
+    n_paths: int = Query(10_000, ge=100, le=100_000, description="Number of equity paths"),
+    horizon: Optional[int] = Query(None, ge=1, le=2_000, description="Trades per path (default 100)"),
+    starting_equity: float = Query(10_000.0, gt=0, description="Account size at the start"),
+    position_fraction: float = Query(1.0, gt=0, le=10, description="Fraction of equity committed per trade"),
+    ruin_threshold: float = Query(0.5, gt=0, lt=1, description="Drawdown that counts as ruin"),
+    seed: Optional[int] = Query(None, description="Seed for reproducible results"),
+):
+    """
+    Monte Carlo projection of the account from historical per-trade returns.
+
+    - Bootstraps closed trades into equity paths
+    - Returns risk of ruin, max-drawdown distribution and projected P&L percentiles
+    - Returns 400 if there are no closed trades
+    """
+    try:
+        # Shared per data version, so repeated simulations skip the fetch entirely
+        frame = supabase_service.get_trade_frame()
+        returns = frame.closed_returns()
+        return simulate_equity(
+            returns,
+            n_paths=n_paths,
+            horizon=horizon,
+            starting_equity=starting_equity,
+            position_fraction=position_fraction,
+            ruin_threshold=ruin_threshold,
+            seed=seed,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running simulation: {str(e)}")
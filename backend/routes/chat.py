@@ -1,36 +1,140 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Tuple
 from uuid import UUID
+import time
 
 from services.supabase_service import SupabaseService
 from services.ai_service import AIService
+from services.chat_session_service import ChatSessionService
+from utils.profiling import ProfiledRoute
+from utils.tokens import estimate_message_tokens
 
-router = APIRouter(prefix="/chat", tags=["chat"])
+router = APIRouter(prefix="/chat", tags=["chat"], route_class=ProfiledRoute)
 
 supabase_service = SupabaseService()
 ai_service = AIService()
+chat_sessions = ChatSessionService()
+
+# Once the kept history exceeds this many tokens, older turns are folded into the summary
+HISTORY_TOKEN_THRESHOLD = 1500
+# Compaction keeps only the newest exchanges that fit in this many tokens, so the
+# next summarization is several turns away instead of on the next follow-up
+HISTORY_TOKEN_LOW_WATER = HISTORY_TOKEN_THRESHOLD // 2
+# Rebuild the cached trade context at least this often, to pick up writes made
+# outside this process (e.g. directly in Supabase)
+TRADES_CONTEXT_MAX_AGE_SECONDS = 300
+# Upper bound on trades quoted alongside a question that names tags, setups or tickers
+MAX_FOCUS_TRADES = 20
 
 
 class ChatRequest(BaseModel):
     message: str
     user_id: Optional[UUID] = None
+    session_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: str
+
+
+def _get_trades_context(session) -> Tuple[str, int]:
+    """
+    Return the session's cached trade-context block and its token count, rebuilding
+    them only when trades have been written since they were built or have aged out.
+    """
+    version = supabase_service.data_version
+    age = time.monotonic() - session.trades_context_built_at
+    if (
+        session.trades_context is None
+        or session.trades_context_version != version
+        or age > TRADES_CONTEXT_MAX_AGE_SECONDS
+    ):
+        trades = supabase_service.get_all_trades()
+        session.trades_context, session.trades_context_tokens = ai_service.prepare_trades_context(trades)
+        session.trades_context_version = version
+        session.trades_context_built_at = time.monotonic()
+    return session.trades_context, session.trades_context_tokens
+
+
+def _compact_history(session):
+    """
+    Fold older turns into the running summary once history passes the token threshold.
+
+    Whole user/assistant exchanges are kept, newest first, up to the low-water mark.
+    If summarizing fails the history is left intact and compaction is retried next turn.
+    """
+    messages = session.messages
+    if estimate_message_tokens(messages) <= HISTORY_TOKEN_THRESHOLD:
+        return
+    split = len(messages)
+    kept_tokens = 0
+    while split >= 2:
+        exchange_tokens = estimate_message_tokens(messages[split - 2:split])
+        if kept_tokens + exchange_tokens > HISTORY_TOKEN_LOW_WATER:
+            break
+        kept_tokens += exchange_tokens
+        split -= 2
+    try:
+        session.summary = ai_service.summarize_conversation(session.summary, messages[:split])
+    except Exception as e:
+        print(f"Warning: keeping full chat history: {str(e)}")
+        return
+    session.messages = messages[split:]
 
 
 @router.post("", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Chat with AI coach about trading history"""
+def chat(request: ChatRequest):
+    """
+    Chat with AI coach about trading history.
+
+    - Pass the returned session_id on follow-up messages to keep conversation history
+    - Older turns are summarized so prompt size stays bounded over long conversations
+    """
     try:
-        # Get all trades (optionally filter by user_id in the future)
-        trades = supabase_service.get_all_trades()
-        
-        # Generate chat response using AI service
-        response = ai_service.chat(request.message, trades)
-        
-        return ChatResponse(response=response)
+        session = chat_sessions.get_or_create(request.session_id)
+
+        with session.lock:
+            # Trade context is cached per session (optionally filter by user_id in the future)
+            trades_context, trades_context_tokens = _get_trades_context(session)
+
+            # Pull the trades the question is about (tags, setups, tickers it mentions)
+            focus_ids = supabase_service.get_trade_index().match_text(request.message)
+            focus_trades = None
+            if focus_ids:
+                focus_trades = supabase_service.get_trades_by_ids(focus_ids[:supabase_service.ID_BATCH_SIZE])
+                focus_trades = focus_trades[:MAX_FOCUS_TRADES]
+
+            # Generate chat response using AI service; on failure this raises before
+            # the turn is recorded, so history only holds real exchanges
+            response = ai_service.chat(
+                request.message,
+                [],
+                history=session.messages,
+                summary=session.summary,
+                trades_context=trades_context,
+                trades_context_tokens=trades_context_tokens,
+                focus_trades=focus_trades,
+            )
+
+            session.messages.append({"role": "user", "content": request.message})
+            session.messages.append({"role": "assistant", "content": response})
+            _compact_history(session)
+
+        return ChatResponse(response=response, session_id=session.id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating chat response: {str(e)}")
+
+
+@router.delete("/{session_id}", status_code=204)
+async def delete_chat_session(session_id: str):
+    """
+    Clear a chat session's history.
+
+    - Returns 204 No Content on success
+    - Returns 404 if the session does not exist
+    """
+    if not chat_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return None
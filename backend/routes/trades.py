@@ -1,17 +1,36 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import asyncio
 
-from models.trade_model import TradeCreate, TradeUpdate, TradeResponse
+from models.trade_model import (
+    TradeCreate,
+    TradeUpdate,
+    TradeResponse,
+    TradeListAdapter,
+    FEEDBACK_SECTIONS,
+    affected_feedback_sections,
+)
 from services.supabase_service import SupabaseService
-from services.ai_service import AIService
+from services.ai_service import AIService, ANALYSIS_FIELDS
+from services.change_feed import change_feed
+from utils.http import dumps, json_response
+from utils.profiling import ProfiledRoute, stage
 
-router = APIRouter(prefix="/trades", tags=["trades"])
+router = APIRouter(prefix="/trades", tags=["trades"], route_class=ProfiledRoute)
 
 # Initialize services (using dependency injection pattern)
 # In production, consider using FastAPI's Depends for better testability
 supabase_service = SupabaseService()
 ai_service = AIService()
 
+# Idle change-feed streams send a comment this often to keep proxies from closing them
+CHANGES_HEARTBEAT_SECONDS = 15
+
+# Handlers that call Supabase or Groq are plain `def` so FastAPI runs them in its
+# threadpool instead of blocking the event loop. Concurrent identical reads and
+# LLM calls are then coalesced by the services' single-flight layer.
+
 
 def _create_clean_trade_dict(trade: dict) -> dict:
     """
@@ -36,8 +55,19 @@ def _create_clean_trade_dict(trade: dict) -> dict:
     }
 
 
+def _select_feedback_sections(trades: List[dict], sections: List[str]) -> List[dict]:
+    """Return copies of trades with ai_feedback_sections trimmed to the given sections"""
+    selected = []
+    for trade in trades:
+        feedback = trade.get("ai_feedback_sections")
+        if feedback:
+            trade = {**trade, "ai_feedback_sections": {name: feedback[name] for name in sections if name in feedback}}
+        selected.append(trade)
+    return selected
+
+
 @router.post("", response_model=TradeResponse, status_code=201)
-async def create_trade(trade: TradeCreate):
+def create_trade(trade: TradeCreate):
     """
     Create a new trade and automatically generate AI feedback.
     
@@ -59,9 +89,12 @@ async def create_trade(trade: TradeCreate):
             ai_feedback = ai_service.analyze_trade(clean_trade_for_ai)
             
             # Update trade with AI feedback in Supabase
-            supabase_service.update_ai_feedback(created_trade["id"], ai_feedback)
+            feedback_version = ai_service.prompt_version("trade_analysis")
+            supabase_service.update_ai_feedback(created_trade["id"], ai_feedback, feedback_version)
             # Update local dict for response
-            created_trade["ai_feedback"] = ai_feedback
+            created_trade["ai_feedback"] = None
+            created_trade["ai_feedback_sections"] = ai_feedback
+            created_trade["ai_feedback_version"] = feedback_version
         except Exception as e:
             # Log error but don't fail the request if AI analysis fails
             print(f"Warning: Error generating AI feedback: {str(e)}")
@@ -78,22 +111,136 @@ async def create_trade(trade: TradeCreate):
 
 
 @router.get("", response_model=List[TradeResponse])
-async def get_trades():
+def get_trades(
+    request: Request,
+    sections: Optional[List[str]] = Query(None, description="Only include these AI feedback sections"),
+):
     """
     Get all trades ordered by date DESC.
     
     Returns a list of all trades in the database, sorted by date (newest first).
+    
+    - Validates and encodes the whole list in one pass (no per-row model construction)
+    - Returns 304 Not Modified when If-None-Match matches the current ETag
+    - Compresses the body with brotli or gzip based on Accept-Encoding
+    - ?sections=takeaways trims ai_feedback_sections to the listed sections
+    - X-Change-Seq is the change-feed position of the snapshot; open /trades/changes
+      with ?since=<it> to receive every change made after it
     """
+    unknown = set(sections or ()) - set(FEEDBACK_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown feedback sections: {', '.join(sorted(unknown))}")
+    
     try:
+        # Read the feed position before fetching, so a change racing the fetch is
+        # at worst replayed on top of a snapshot that already has it, never lost
+        change_seq = change_feed.last_seq
         trades = supabase_service.get_all_trades()
-        # Convert to Pydantic models for validation and serialization
-        return [TradeResponse(**trade) for trade in trades]
+        if sections is not None:
+            trades = _select_feedback_sections(trades, sections)
+        # Validate in bulk and encode directly to JSON bytes
+        with stage("trades.serialize"):
+            body = TradeListAdapter.dump_json(TradeListAdapter.validate_python(trades))
+        with stage("http.encode"):
+            return json_response(request, body, headers={"X-Change-Seq": str(change_seq)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching trades: {str(e)}")
 
 
+@router.get("/search", response_model=List[TradeResponse])
+def search_trades(
+    request: Request,
+    tag: Optional[List[str]] = Query(None, description="Tags to match"),
+    setup: Optional[List[str]] = Query(None, description="Setups to match (any of)"),
+    ticker: Optional[List[str]] = Query(None, description="Tickers to match (any of)"),
+    tags_mode: str = Query("all", description="'all' to require every tag, 'any' for at least one"),
+):
+    """
+    Search trades by tag, setup and ticker using the inverted index.
+    
+    - Filters on different fields are combined with AND
+    - e.g. /trades/search?tag=breakout&ticker=AAPL
+    - Returns 400 if no filter is given or tags_mode is invalid
+    """
+    try:
+        if not (tag or setup or ticker):
+            raise HTTPException(status_code=400, detail="At least one of tag, setup or ticker is required")
+        
+        index = supabase_service.get_trade_index()
+        trade_ids = index.query(tags=tag, setups=setup, tickers=ticker, tags_mode=tags_mode)
+        trades = supabase_service.get_trades_by_ids(trade_ids) if trade_ids else []
+        
+        with stage("trades.serialize"):
+            body = TradeListAdapter.dump_json(TradeListAdapter.validate_python(trades))
+        with stage("http.encode"):
+            return json_response(request, body)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching trades: {str(e)}")
+
+
+def _sse_event(event: dict) -> bytes:
+    """Format a change-feed event as a Server-Sent Events message"""
+    data = event["trade"] if event["type"] != "reset" else {}
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event["seq"], event["type"].encode(), dumps(data))
+
+
+@router.get("/changes")
+async def stream_trade_changes(
+    request: Request,
+    user_id: Optional[str] = Query(None, description="Owner whose trade changes to stream"),
+    since: Optional[int] = Query(None, description="Last sequence number applied by the client"),
+):
+    """
+    Stream row-level trade changes as Server-Sent Events.
+    
+    - Events: insert and update (full row, including late-arriving ai_feedback), delete (id)
+    - Each event id is a sequence number; reconnect with ?since=<id> or Last-Event-ID to resume
+    - Start from the X-Change-Seq of a GET /trades snapshot to miss nothing after it
+    - A reset event means the resume point is gone and the client should refetch /trades
+    """
+    # On an automatic reconnect the browser sends the last id it saw, which is newer
+    # than the ?since= the stream was first opened with
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    
+    subscription, backlog, reset = change_feed.subscribe(user_id, since)
+    
+    async def events():
+        try:
+            if reset:
+                yield _sse_event({"seq": change_feed.last_seq, "type": "reset"})
+            for event in backlog:
+                yield _sse_event(event)
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), CHANGES_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if subscription.overflowed:
+                    # Client fell too far behind; make it refetch and reconnect
+                    yield _sse_event({"seq": change_feed.last_seq, "type": "reset"})
+                    break
+                yield _sse_event(event)
+        finally:
+            change_feed.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{id}", response_model=TradeResponse)
-async def get_trade(id: str):
+def get_trade(id: str):
     """
     Get a single trade by ID.
     
@@ -113,12 +260,12 @@ async def get_trade(id: str):
 
 
 @router.put("/{id}", response_model=TradeResponse)
-async def update_trade(id: str, trade_update: TradeUpdate):
+def update_trade(id: str, trade_update: TradeUpdate):
     """
     Update an existing trade.
     
     - Only updates fields provided in the request
-    - Automatically regenerates AI feedback after update
+    - Regenerates only the AI feedback sections affected by the changed fields
     - Returns 404 if trade not found
     - Returns 500 if update fails
     """
@@ -140,15 +287,22 @@ async def update_trade(id: str, trade_update: TradeUpdate):
         if not updated_trade:
             raise HTTPException(status_code=500, detail="Failed to update trade")
         
-        # Regenerate AI feedback if trade data changed
+        # Regenerate the AI feedback sections affected by the changed fields
         try:
-            # Create clean dict for AI analysis (excludes database metadata)
-            clean_trade_for_ai = _create_clean_trade_dict(updated_trade)
-            ai_feedback = ai_service.analyze_trade(clean_trade_for_ai)
-            
-            supabase_service.update_ai_feedback(id, ai_feedback)
-            # Update local dict for response
-            updated_trade["ai_feedback"] = ai_feedback
+            changed_fields = [
+                field for field in ANALYSIS_FIELDS
+                if updated_trade.get(field) != existing_trade.get(field)
+            ]
+            sections = affected_feedback_sections(changed_fields)
+            if sections or not updated_trade.get("ai_feedback_sections"):
+                ai_feedback = ai_service.refresh_feedback(updated_trade, sections)
+                
+                feedback_version = ai_service.prompt_version("trade_analysis")
+                supabase_service.update_ai_feedback(id, ai_feedback, feedback_version)
+                # Update local dict for response
+                updated_trade["ai_feedback"] = None
+                updated_trade["ai_feedback_sections"] = ai_feedback
+                updated_trade["ai_feedback_version"] = feedback_version
         except Exception as e:
             # Log error but don't fail the request if AI analysis fails
             print(f"Warning: Error regenerating AI feedback: {str(e)}")
@@ -167,7 +321,7 @@ async def update_trade(id: str, trade_update: TradeUpdate):
 
 
 @router.delete("/{id}", status_code=204)
-async def delete_trade(id: str):
+def delete_trade(id: str):
     """
     Delete a trade by ID.
     
@@ -1,10 +1,55 @@
 import os
 from groq import Groq
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Tuple
+import hashlib
 import json
+import numpy as np
+
+from models.trade_frame import TradeFrame
+from models.trade_model import FEEDBACK_SECTIONS, TradeFeedback
+from services.prompts import prompt_registry
+from services.simulation import describe_projection, simulate_equity
+from utils.profiling import timed
+from utils.singleflight import SingleFlight
+from utils.tokens import estimate_message_tokens, estimate_tokens, truncate_to_tokens
+
+# Fields that determine a trade's analysis; used to recognise identical requests
+ANALYSIS_FIELDS = ("ticker", "entry", "exit", "direction", "setup", "notes", "tags", "date")
+# Output tokens allowed per feedback section
+SECTION_MAX_TOKENS = 220
+# Share of the chat prompt budget given to the trade history; the rest is left for
+# the question, matching trades, conversation summary and recent turns
+CHAT_CONTEXT_MAX_TOKENS = 8000
+# Caps on the chat prompt parts that cannot be cut by the prompt budget, so that
+# together with the largest summary they always leave room within the chat template
+CHAT_MESSAGE_MAX_TOKENS = 1500
+CHAT_FOCUS_MAX_TOKENS = 2000
+CHAT_HISTORY_MAX_TOKENS = 3000
+# Setups listed in the insights prompt; the rest are counted in a closing line
+MAX_PROMPT_SETUPS = 20
+SETUP_NAME_MAX_CHARS = 60
+
+
+def _setup_name(setup: str) -> str:
+    return setup if len(setup) <= SETUP_NAME_MAX_CHARS else setup[:SETUP_NAME_MAX_CHARS - 3] + "..."
+
+
+def _recent_turns(history: List[Dict], max_tokens: int) -> List[Dict]:
+    """Newest whole exchanges of history that fit within max_tokens"""
+    kept = list(history)
+    while kept and estimate_message_tokens(kept) > max_tokens:
+        kept = kept[2:] if len(kept) > 1 else []
+    return kept
+
+
+def _fingerprint(data) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
 
 
 class AIService:
+    # Coalesces concurrent identical LLM calls across all instances
+    _flights = SingleFlight()
+
     def __init__(self):
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
@@ -12,10 +57,35 @@ class AIService:
         
         self.client = Groq(api_key=api_key)
         self.model = "llama-3.1-8b-instant"
+        self.prompts = prompt_registry
 
-    def analyze_trade(self, trade: Dict) -> str:
-        """Analyze a single trade and provide detailed feedback"""
-        
+    def prompt_version(self, name: str) -> str:
+        """Version id of the active prompt template, stored alongside generated feedback"""
+        return self.prompts.version(name)
+
+    @timed("groq.completion")
+    def _complete(self, **kwargs):
+        """Run a Groq chat completion (timed as its own profiling stage)"""
+        return self.client.chat.completions.create(**kwargs)
+
+    @timed("ai.analyze_trade")
+    def analyze_trade(self, trade: Dict, sections: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """
+        Analyze a single trade and return structured feedback by section.
+
+        Pass `sections` to generate only those (e.g. after an edit that affects
+        only some of them); by default every section in FEEDBACK_SECTIONS is
+        generated. Concurrent calls for the same trade data share one LLM request.
+        """
+        sections = tuple(name for name in FEEDBACK_SECTIONS if sections is None or name in sections)
+        if not sections:
+            raise ValueError(f"sections must be drawn from: {', '.join(FEEDBACK_SECTIONS)}")
+        trade_hash = _fingerprint({field: trade.get(field) for field in ANALYSIS_FIELDS})
+        key = ("analyze_trade", self.prompt_version("trade_analysis"), trade_hash, sections)
+        analysis, shared = self._flights.do(key, self._analyze_trade, trade, sections)
+        return dict(analysis) if shared else analysis
+
+    def _analyze_trade(self, trade: Dict, sections: Tuple[str, ...]) -> Dict[str, str]:
         # Calculate P&L
         entry = trade.get("entry", 0)
         exit_price = trade.get("exit", 0)
@@ -28,165 +98,165 @@ class AIService:
             pnl = entry - exit_price
             pnl_percent = ((entry - exit_price) / entry) * 100
         
-        is_winner = pnl > 0
-        
-        prompt = f"""You are an expert trading coach analyzing a trade. Provide a detailed, constructive critique.
-
-Trade Details:
-- Ticker: {trade.get('ticker', 'N/A')}
-- Direction: {trade.get('direction', 'N/A').upper()}
-- Entry Price: ${trade.get('entry', 0):.2f}
-- Exit Price: ${trade.get('exit', 0):.2f}
-- P&L: ${pnl:.2f} ({pnl_percent:+.2f}%)
-- Setup: {trade.get('setup', 'N/A')}
-- Notes: {trade.get('notes', 'None provided')}
-- Tags: {', '.join(trade.get('tags', [])) if trade.get('tags') else 'None'}
-- Date: {trade.get('date', 'N/A')}
-
-Provide a comprehensive analysis covering:
-1. Trade Execution: Was the entry/exit timing good? Why or why not?
-2. Setup Quality: Evaluate the setup - was it high probability? What were the strengths/weaknesses?
-3. Risk Management: Was position sizing appropriate? Was the risk/reward ratio favorable?
-4. Psychology: What psychological factors may have influenced this trade (fear, greed, FOMO, etc.)?
-5. What Went Well: Identify positive aspects of this trade
-6. What Could Be Improved: Specific, actionable improvements
-7. Key Takeaways: 2-3 main lessons from this trade
-
-Be specific, constructive, and educational. Format your response in clear paragraphs."""
+        fields = TradeFeedback.model_fields
+        prompt = self.prompts.render(
+            "trade_analysis",
+            ticker=trade.get('ticker', 'N/A'),
+            direction=trade.get('direction', 'N/A').upper(),
+            entry=trade.get('entry', 0),
+            exit=trade.get('exit', 0),
+            pnl=pnl,
+            pnl_percent=pnl_percent,
+            setup=trade.get('setup', 'N/A'),
+            notes=trade.get('notes', 'None provided'),
+            tags=', '.join(trade.get('tags', [])) if trade.get('tags') else 'None',
+            date=trade.get('date', 'N/A'),
+            sections="\n".join(f'- "{name}": {fields[name].description}' for name in sections),
+        )
 
         try:
-            chat_completion = self.client.chat.completions.create(
+            chat_completion = self._complete(
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are an expert trading coach with deep knowledge of technical analysis, risk management, and trading psychology. Provide detailed, actionable feedback."
+                        "content": prompt.system
                     },
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": prompt.user
                     }
                 ],
                 model=self.model,
                 temperature=0.7,
-                max_tokens=1500
+                # Output budget scales with the number of sections requested
+                max_tokens=SECTION_MAX_TOKENS * len(sections) + 50,
+                response_format={"type": "json_object"}
             )
             
-            return chat_completion.choices[0].message.content
+            feedback = TradeFeedback.model_validate_json(chat_completion.choices[0].message.content)
+            # Fields default to "" so partial requests validate; every requested one must be filled
+            missing = [name for name in sections if not getattr(feedback, name).strip()]
+            if missing:
+                raise ValueError(f"response is missing sections: {', '.join(missing)}")
         except Exception as e:
-            return f"Error generating AI analysis: {str(e)}"
+            raise Exception(f"Error generating AI analysis: {str(e)}")
+        
+        return {name: getattr(feedback, name).strip() for name in sections}
+
+    @timed("ai.refresh_feedback")
+    def refresh_feedback(self, trade: Dict, sections: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """
+        Regenerate some sections of a trade's stored feedback and keep the rest.
 
-    def analyze_full_history(self, trades: List[Dict]) -> str:
-        """Analyze the full trading history and provide comprehensive insights"""
+        Falls back to generating every section when sections is None or when the
+        stored feedback came from a different prompt version.
+
+        Args:
+            trade: Trade row, including ai_feedback_sections/ai_feedback_version if stored
+            sections: Sections to regenerate
+
+        Returns:
+            Dict[str, str]: Complete feedback, ready to store
+        """
+        existing = trade.get("ai_feedback_sections") or {}
+        if sections is None or trade.get("ai_feedback_version") != self.prompt_version("trade_analysis"):
+            return self.analyze_trade(trade)
         
+        # Also fill in any section the stored feedback is missing
+        stale = set(sections) | {name for name in FEEDBACK_SECTIONS if not existing.get(name)}
+        feedback = dict(existing)
+        feedback.update(self.analyze_trade(trade, stale))
+        return feedback
+
+    @timed("ai.analyze_full_history")
+    def analyze_full_history(
+        self,
+        trades: List[Dict],
+        data_version: Optional[int] = None,
+        frame: Optional[TradeFrame] = None,
+    ) -> str:
+        """
+        Analyze the full trading history and provide comprehensive insights.
+
+        Concurrent calls for the same data version (SupabaseService.data_version)
+        share one LLM request; without a version the trades themselves are hashed.
+        Pass a TradeFrame already built from `trades` to avoid building another.
+        """
+        version = data_version if data_version is not None else _fingerprint(trades)
+        key = ("analyze_full_history", self.prompt_version("full_history"), version)
+        insights, _ = self._flights.do(key, self._analyze_full_history, trades, frame)
+        return insights
+
+    def _analyze_full_history(self, trades: List[Dict], frame: Optional[TradeFrame] = None) -> str:
         if not trades:
             return "No trades found. Start adding trades to get personalized insights!"
         
-        # Calculate statistics
-        total_trades = len(trades)
-        winners = []
-        losers = []
-        setups = {}
-        total_pnl = 0
-        
-        for trade in trades:
-            entry = trade.get("entry", 0)
-            exit_price = trade.get("exit", 0)
-            direction = trade.get("direction", "long")
-            setup = trade.get("setup", "Unknown")
-            
-            if direction == "long":
-                pnl = exit_price - entry
-            else:
-                pnl = entry - exit_price
-            
-            total_pnl += pnl
-            
-            if pnl > 0:
-                winners.append(trade)
-            else:
-                losers.append(trade)
-            
-            if setup not in setups:
-                setups[setup] = {"wins": 0, "losses": 0, "pnl": 0}
-            
-            if pnl > 0:
-                setups[setup]["wins"] += 1
-            else:
-                setups[setup]["losses"] += 1
-            setups[setup]["pnl"] += pnl
+        frame = frame if frame is not None else TradeFrame.from_trades(trades)
+        
+        # Calculate statistics over closed trades (a zero P&L trade counts as a loss)
+        total_trades = len(frame)
+        pnl = frame.pnl()[frame.closed]
+        is_winner = pnl > 0
+        winners = int(np.count_nonzero(is_winner))
+        losers = int(pnl.size - winners)
+        total_pnl = float(pnl.sum())
         
-        win_rate = (len(winners) / total_trades * 100) if total_trades > 0 else 0
+        win_rate = (winners / pnl.size * 100) if pnl.size > 0 else 0
         
         # Build setup analysis
+        setups = frame.setup_stats()
         setup_analysis = []
-        for setup, stats in setups.items():
+        # List the setups with the largest P&L impact; the prompt budget only trims recent trades
+        for stats in sorted(setups, key=lambda x: abs(x["pnl"]), reverse=True)[:MAX_PROMPT_SETUPS]:
             setup_total = stats["wins"] + stats["losses"]
             setup_win_rate = (stats["wins"] / setup_total * 100) if setup_total > 0 else 0
-            setup_analysis.append(f"- {setup}: {stats['wins']}W/{stats['losses']}L ({setup_win_rate:.1f}% win rate, ${stats['pnl']:.2f} P&L)")
+            setup_analysis.append(f"- {_setup_name(stats['setup'])}: {stats['wins']}W/{stats['losses']}L ({setup_win_rate:.1f}% win rate, ${stats['pnl']:.2f} P&L)")
+        if len(setups) > MAX_PROMPT_SETUPS:
+            setup_analysis.append(f"- ...and {len(setups) - MAX_PROMPT_SETUPS} more setups with smaller P&L")
         
         # Find best and worst setups
-        best_setup = max(setups.items(), key=lambda x: x[1]["pnl"]) if setups else ("N/A", {})
-        worst_setup = min(setups.items(), key=lambda x: x[1]["pnl"]) if setups else ("N/A", {})
+        best_setup = max(setups, key=lambda x: x["pnl"]) if setups else {"setup": "N/A", "pnl": 0}
+        worst_setup = min(setups, key=lambda x: x["pnl"]) if setups else {"setup": "N/A", "pnl": 0}
         
         # Calculate average win and loss
-        avg_win = 0.0
-        if winners:
-            win_amounts = [
-                t.get('exit', 0) - t.get('entry', 0) if t.get('direction') == 'long' 
-                else t.get('entry', 0) - t.get('exit', 0) 
-                for t in winners
-            ]
-            avg_win = sum(win_amounts) / len(winners) if win_amounts else 0.0
-        
-        avg_loss = 0.0
-        if losers:
-            loss_amounts = [
-                t.get('exit', 0) - t.get('entry', 0) if t.get('direction') == 'long' 
-                else t.get('entry', 0) - t.get('exit', 0) 
-                for t in losers
-            ]
-            avg_loss = sum(loss_amounts) / len(losers) if loss_amounts else 0.0
-
-        prompt = f"""You are an expert trading coach analyzing a trader's complete trading history. Provide comprehensive insights and a personalized improvement plan.
-
-Trading Statistics:
-- Total Trades: {total_trades}
-- Winners: {len(winners)} ({win_rate:.1f}% win rate)
-- Losers: {len(losers)}
-- Total P&L: ${total_pnl:.2f}
-- Average Win: ${avg_win:.2f}
-- Average Loss: ${avg_loss:.2f}
-
-Setup Performance:
-{chr(10).join(setup_analysis)}
-
-Best Performing Setup: {best_setup[0]} (${best_setup[1].get('pnl', 0):.2f} P&L)
-Worst Performing Setup: {worst_setup[0]} (${worst_setup[1].get('pnl', 0):.2f} P&L)
-
-Recent Trades Summary:
-{json.dumps(trades[:10], indent=2, default=str)}
-
-Provide a comprehensive analysis covering:
-1. Overall Performance Assessment: Evaluate the trader's performance holistically
-2. Strongest Setups: Which setups work best and why
-3. Weakest Setups: Which setups are underperforming and what might be wrong
-4. Win/Loss Analysis: Patterns in winning vs losing trades
-5. Risk Management Mistakes: Common risk management errors observed
-6. Behavioral Patterns: Psychological patterns that may be affecting performance (overtrading, revenge trading, etc.)
-7. Personalized Improvement Plan: Specific, actionable steps to improve trading performance
-
-Be detailed, specific, and provide actionable advice. Format your response in clear sections with headers."""
+        avg_win = float(pnl[is_winner].mean()) if winners else 0.0
+        avg_loss = float(pnl[~is_winner].mean()) if losers else 0.0
+
+        # Forward-looking risk from bootstrapped equity paths
+        returns = frame.closed_returns()
+        if returns.size:
+            projection = describe_projection(simulate_equity(returns, n_paths=10_000, seed=0))
+        else:
+            projection = "Not enough closed trades to project."
 
         try:
-            chat_completion = self.client.chat.completions.create(
+            prompt = self.prompts.render(
+                "full_history",
+                total_trades=total_trades,
+                winners=winners,
+                win_rate=win_rate,
+                losers=losers,
+                total_pnl=total_pnl,
+                avg_win=avg_win,
+                avg_loss=avg_loss,
+                setup_analysis="\n".join(setup_analysis),
+                best_setup=_setup_name(best_setup["setup"]),
+                best_setup_pnl=best_setup["pnl"],
+                worst_setup=_setup_name(worst_setup["setup"]),
+                worst_setup_pnl=worst_setup["pnl"],
+                projection=projection,
+                recent_trades=json.dumps(trades[:10], indent=2, default=str),
+            )
+
+            chat_completion = self._complete(
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are an expert trading coach with deep knowledge of technical analysis, risk management, and trading psychology. Provide comprehensive, actionable insights."
+                        "content": prompt.system
                     },
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": prompt.user
                     }
                 ],
                 model=self.model,
@@ -198,30 +268,121 @@ Be detailed, specific, and provide actionable advice. Format your response in cl
         except Exception as e:
             return f"Error generating AI insights: {str(e)}"
 
-    def chat(self, message: str, trades: List[Dict]) -> str:
-        """Handle chat messages with context from trading history"""
+    @timed("ai.build_trades_context")
+    def build_trades_context(self, trades: List[Dict]) -> str:
+        """Build the trading-history block used as chat context"""
+        return json.dumps(trades, indent=2, default=str) if trades else "No trades recorded yet."
+
+    @timed("ai.prepare_trades_context")
+    def prepare_trades_context(self, trades: List[Dict]) -> Tuple[str, int]:
+        """
+        Build the chat trade context, cut to CHAT_CONTEXT_MAX_TOKENS, with its token count.
+
+        Meant to be cached by the caller (per data version) and passed to chat() with
+        its count, so the history is tokenized once rather than on every turn.
+
+        Returns:
+            Tuple[str, int]: Context text and its token count
+        """
+        context = truncate_to_tokens(self.build_trades_context(trades), CHAT_CONTEXT_MAX_TOKENS)
+        return context, estimate_tokens(context)
+
+    @timed("ai.summarize_conversation")
+    def summarize_conversation(self, summary: str, messages: List[Dict]) -> str:
+        """
+        Fold older chat turns into a running conversation summary.
+
+        Raises:
+            Exception: If the summary cannot be generated; the caller should then
+            keep the turns rather than drop them
+        """
         
-        trades_context = json.dumps(trades, indent=2, default=str) if trades else "No trades recorded yet."
+        transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
         
-        prompt = f"""You are an AI trading coach assistant. The user is asking you a question about their trading.
+        prompt = self.prompts.render(
+            "conversation_summary",
+            summary=summary or 'None yet.',
+            transcript=transcript,
+        )
 
-User Question: {message}
+        try:
+            chat_completion = self._complete(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": prompt.system
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt.user
+                    }
+                ],
+                model=self.model,
+                temperature=0.2,
+                max_tokens=300
+            )
+            
+            return chat_completion.choices[0].message.content
+        except Exception as e:
+            raise Exception(f"Error summarizing conversation: {str(e)}")
 
-Trading History:
-{trades_context}
+    @timed("ai.chat")
+    def chat(
+        self,
+        message: str,
+        trades: List[Dict],
+        history: Optional[List[Dict]] = None,
+        summary: Optional[str] = None,
+        trades_context: Optional[str] = None,
+        focus_trades: Optional[List[Dict]] = None,
+        trades_context_tokens: Optional[int] = None,
+    ) -> str:
+        """
+        Handle chat messages with context from trading history.
 
-Answer the user's question using the trading history as context. Be helpful, educational, and specific. If the question is about a specific trade, reference it. If it's about general trading advice, provide actionable insights."""
+        history holds recent {"role", "content"} turns and summary a digest of older
+        ones; trades_context may be passed pre-built to avoid re-serializing trades,
+        and trades_context_tokens its known token count to avoid re-tokenizing it.
+        focus_trades are the trades the question refers to, quoted next to it so they
+        survive truncation of the full history.
 
+        Raises:
+            Exception: If no reply could be generated, so callers never record an
+            error message as an assistant turn
+        """
+        
+        if trades_context is None:
+            trades_context = self.build_trades_context(trades)
+        
+        # Only the trade history is cut by the prompt budget, so bound everything else here
+        history = _recent_turns(history or [], CHAT_HISTORY_MAX_TOKENS)
+        summary_block = f"\n\nSummary of the Conversation So Far:\n{summary}" if summary else ""
+        focus_block = ""
+        if focus_trades:
+            focus = [{k: v for k, v in trade.items() if not k.startswith("ai_feedback")} for trade in focus_trades]
+            focus_block = f"\n\nTrades Matching the Question:\n{truncate_to_tokens(json.dumps(focus, indent=2, default=str), CHAT_FOCUS_MAX_TOKENS)}"
+        
         try:
-            chat_completion = self.client.chat.completions.create(
+            prompt = self.prompts.render(
+                "chat",
+                reserved_tokens=estimate_message_tokens(history),
+                value_tokens={"trades_context": trades_context_tokens} if trades_context_tokens is not None else None,
+                trades_context=trades_context,
+                summary_block=summary_block,
+                message=truncate_to_tokens(message, CHAT_MESSAGE_MAX_TOKENS),
+                focus_block=focus_block,
+            )
+
+            chat_completion = self._complete(
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a helpful AI trading coach assistant. Answer questions about trading using the provided trading history as context. Be specific, educational, and actionable."
+                        "content": prompt.system
                     },
+                    *history,
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": prompt.user
                     }
                 ],
                 model=self.model,
@@ -231,5 +392,4 @@ Answer the user's question using the trading history as context. Be helpful, edu
             
             return chat_completion.choices[0].message.content
         except Exception as e:
-            return f"Error generating chat response: {str(e)}"
-
+            raise Exception(f"Chat completion failed: {str(e)}")
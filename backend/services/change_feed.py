@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+
+DEFAULT_CHANNEL = "default"
+
+
+def channel_for(user_id) -> str:
+    """Fan-out channel for a user; trades without a user share the default channel"""
+    return str(user_id) if user_id else DEFAULT_CHANNEL
+
+
+class Subscription:
+    """A single client's view of a channel, delivered on that client's event loop"""
+
+    QUEUE_SIZE = 1000
+
+    def __init__(self, channel: str, loop: asyncio.AbstractEventLoop):
+        self.channel = channel
+        self.loop = loop
+        self.queue: "asyncio.Queue[Dict]" = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        # Set when the client fell too far behind; it must refetch and resubscribe
+        self.overflowed = False
+
+    def _deliver(self, event: Dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class ChangeFeed:
+    """
+    Row-level change events for trades, fanned out per user.
+
+    Every event gets a process-wide sequence number. Each channel keeps the last
+    BUFFER_SIZE events so a reconnecting client can resume from the last sequence
+    number it saw; if that point has already been evicted (or predates a restart)
+    the client is told to reset, i.e. refetch the full list.
+
+    Events are published from the SupabaseService write paths, which run in
+    worker threads, and handed to each subscriber's event loop thread-safely.
+    """
+
+    BUFFER_SIZE = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._buffers: Dict[str, Deque[Dict]] = {}
+        # Highest sequence number evicted from each channel's buffer
+        self._evicted: Dict[str, int] = {}
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def publish(self, event_type: str, trade: Dict):
+        """
+        Record a change and push it to the trade owner's subscribers.
+
+        Args:
+            event_type: "insert", "update" or "delete"
+            trade: Full trade row (for delete, at least id and user_id)
+        """
+        channel = channel_for(trade.get("user_id"))
+        with self._lock:
+            self._seq += 1
+            event = {"seq": self._seq, "type": event_type, "trade": trade}
+            buffer = self._buffers.setdefault(channel, deque(maxlen=self.BUFFER_SIZE))
+            if len(buffer) == buffer.maxlen:
+                self._evicted[channel] = buffer[0]["seq"]
+            buffer.append(event)
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+            except RuntimeError:
+                # Subscriber's loop has closed; it will be removed on unsubscribe
+                pass
+
+    def subscribe(self, user_id=None, since: Optional[int] = None) -> Tuple[Subscription, List[Dict], bool]:
+        """
+        Start receiving a user's changes, optionally replaying those after `since`.
+
+        Must be called from the event loop that will consume the subscription.
+
+        Args:
+            user_id: Owner whose trade changes to receive
+            since: Last sequence number the client applied
+
+        Returns:
+            Tuple[Subscription, List[Dict], bool]: The subscription, buffered events
+            to replay, and whether the client must reset (refetch) instead
+        """
+        channel = channel_for(user_id)
+        subscription = Subscription(channel, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+            if since is None:
+                return subscription, [], False
+            if since > self._seq or since < self._evicted.get(channel, 0):
+                return subscription, [], True
+            backlog = [event for event in self._buffers.get(channel, ()) if event["seq"] > since]
+            return subscription, backlog, False
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop delivering events to a subscription"""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+
+# Shared by all SupabaseService instances so every write path feeds one stream
+change_feed = ChangeFeed()
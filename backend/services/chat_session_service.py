@@ -0,0 +1,85 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class ChatSession:
+    """
+    Server-side state for one chat conversation.
+
+    Holds the recent message window, a running summary of older turns and the
+    cached trade-context block with the data version it was built from.
+    """
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.messages: List[Dict[str, str]] = []
+        self.summary: str = ""
+        self.trades_context: Optional[str] = None
+        self.trades_context_tokens: int = 0
+        self.trades_context_version: Optional[int] = None
+        self.trades_context_built_at: float = 0.0
+        self.last_active: float = time.monotonic()
+        # Held for the duration of a turn so concurrent messages apply in order
+        self.lock = threading.Lock()
+
+
+class ChatSessionService:
+    """
+    In-memory store for chat sessions.
+
+    Sessions are kept in LRU order and evicted when idle for too long or when the
+    store is full. State is per-process: with multiple workers, sticky sessions are
+    required for a conversation to keep its history.
+    """
+
+    MAX_SESSIONS = 500
+    SESSION_TTL_SECONDS = 60 * 60
+
+    def __init__(self):
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ChatSession:
+        """
+        Return the session for session_id, creating a new one if it is missing or expired.
+
+        Args:
+            session_id: Existing session id, or None to start a new conversation
+
+        Returns:
+            ChatSession: The active session
+        """
+        with self._lock:
+            self._evict_expired()
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ChatSession(session_id or str(uuid.uuid4()))
+                self._sessions[session.id] = session
+                while len(self._sessions) > self.MAX_SESSIONS:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session.id)
+            session.last_active = time.monotonic()
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Delete a session.
+
+        Returns:
+            bool: True if the session existed
+        """
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _evict_expired(self):
+        """Drop sessions idle longer than SESSION_TTL_SECONDS (caller holds the lock)"""
+        cutoff = time.monotonic() - self.SESSION_TTL_SECONDS
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_active >= cutoff:
+                break
+            self._sessions.popitem(last=False)
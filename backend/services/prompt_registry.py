@@ -0,0 +1,223 @@
+import hashlib
+import os
+import threading
+from string import Formatter
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils.profiling import timed
+from utils.tokens import estimate_tokens, truncate_to_tokens
+
+
+class PromptBudgetExceeded(ValueError):
+    """Raised when a rendered prompt cannot be brought under its token budget"""
+
+
+def _template_fields(text: str) -> Set[str]:
+    """Collect the placeholder names used in a str.format template"""
+    return {field for _, field, _, _ in Formatter().parse(text) if field}
+
+
+def _template_literal(text: str) -> str:
+    """Return only the literal (non-placeholder) parts of a str.format template"""
+    return "".join(literal for literal, _, _, _ in Formatter().parse(text))
+
+
+class PromptTemplate:
+    """
+    A versioned system/user prompt pair.
+
+    Templates are parsed once at registration so placeholders can be validated;
+    the fixed text is tokenized on first use of static_tokens, keeping the
+    tokenizer out of import time. The version id changes whenever the template
+    text changes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        system: str,
+        user: str,
+        max_input_tokens: int,
+        truncate_field: Optional[str] = None,
+        variant: str = "default",
+    ):
+        self.name = name
+        self.variant = variant
+        self.system = system
+        self.user = user
+        self.max_input_tokens = max_input_tokens
+        self.truncate_field = truncate_field
+        self.fields = _template_fields(system) | _template_fields(user)
+
+        if truncate_field and truncate_field not in self.fields:
+            raise ValueError(f"truncate_field '{truncate_field}' is not a placeholder in prompt '{name}'")
+
+        digest = hashlib.sha256(f"{system}\0{user}".encode("utf-8")).hexdigest()[:8]
+        self.version = f"{name}/{variant}@{digest}"
+        self._static_tokens: Optional[int] = None
+
+    @property
+    def static_tokens(self) -> int:
+        """Tokens in the fixed text of the template, excluding placeholder values"""
+        if self._static_tokens is None:
+            self._static_tokens = estimate_tokens(_template_literal(self.system)) + estimate_tokens(_template_literal(self.user))
+        return self._static_tokens
+
+    def format(self, values: Dict) -> Tuple[str, str]:
+        """Fill in the system and user text; raises ValueError on missing placeholders"""
+        missing = self.fields - values.keys()
+        if missing:
+            raise ValueError(f"Missing values for prompt '{self.name}': {', '.join(sorted(missing))}")
+        return self.system.format_map(values), self.user.format_map(values)
+
+
+class RenderedPrompt:
+    """Output of PromptRegistry.render: messages ready to send plus accounting info"""
+
+    def __init__(self, version: str, system: str, user: str, tokens: int, truncated: bool):
+        self.version = version
+        self.system = system
+        self.user = user
+        self.tokens = tokens
+        self.truncated = truncated
+
+
+class PromptRegistry:
+    """
+    Registry of prompt templates with per-template token budgets and usage stats.
+
+    Several variants may be registered under one name; the active one defaults to
+    "default" and can be switched with PROMPT_VARIANTS, e.g.
+    PROMPT_VARIANTS="trade_analysis=concise,chat=default", to A/B a prompt across
+    deployments. Stored results carry the template version so they can be compared
+    or invalidated when a prompt changes.
+    """
+
+    def __init__(self):
+        self._templates: Dict[str, Dict[str, PromptTemplate]] = {}
+        self._active: Dict[str, str] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+        for entry in os.getenv("PROMPT_VARIANTS", "").split(","):
+            name, _, variant = entry.partition("=")
+            if name.strip() and variant.strip():
+                self._active[name.strip()] = variant.strip()
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        """Add a template variant to the registry"""
+        self._templates.setdefault(template.name, {})[template.variant] = template
+        self._stats.setdefault(template.version, {
+            "renders": 0,
+            "total_tokens": 0,
+            "max_tokens": 0,
+            "last_tokens": 0,
+            "truncations": 0,
+        })
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        """Return the active variant of a template"""
+        variants = self._templates.get(name)
+        if not variants:
+            raise KeyError(f"Unknown prompt template: {name}")
+        return variants.get(self._active.get(name, "default")) or variants["default"]
+
+    def version(self, name: str) -> str:
+        """Version id of the active variant of a template"""
+        return self.get(name).version
+
+    @timed("prompt.render")
+    def render(
+        self,
+        name: str,
+        reserved_tokens: int = 0,
+        value_tokens: Optional[Dict[str, int]] = None,
+        **values,
+    ) -> RenderedPrompt:
+        """
+        Render the active variant of a template within its token budget.
+
+        If the prompt is over budget and the template names a truncate_field, that
+        value is cut down to make it fit.
+
+        Args:
+            name: Template name
+            reserved_tokens: Tokens used by other messages sent alongside (e.g. chat history)
+            value_tokens: Known token counts of placeholder values, so large cached
+                values (e.g. chat trade context) are not re-tokenized on every render
+            **values: Placeholder values
+
+        Returns:
+            RenderedPrompt: Rendered system/user text, version and token count
+
+        Raises:
+            PromptBudgetExceeded: If the prompt cannot fit within max_input_tokens
+        """
+        template = self.get(name)
+        known = {field: count for field, count in (value_tokens or {}).items() if field in template.fields}
+        system, user = template.format(values)
+        tokens = self._count_tokens(template, values, system, user, known) + reserved_tokens
+        truncated = False
+
+        if template.truncate_field:
+            values = dict(values)
+            field = template.truncate_field
+            # Token counts are not exactly additive across a cut, so re-check and
+            # trim again if the first cut lands just over budget
+            for _ in range(3):
+                if tokens <= template.max_input_tokens:
+                    break
+                value = str(values[field])
+                value_count = known.pop(field) if field in known else estimate_tokens(value)
+                excess = tokens - template.max_input_tokens
+                values[field] = truncate_to_tokens(value, value_count - excess)
+                system, user = template.format(values)
+                tokens = self._count_tokens(template, values, system, user, known) + reserved_tokens
+                truncated = True
+
+        if tokens > template.max_input_tokens:
+            raise PromptBudgetExceeded(
+                f"Prompt '{template.version}' is {tokens} tokens, over its budget of {template.max_input_tokens}"
+            )
+
+        self._record(template.version, tokens, truncated)
+        return RenderedPrompt(template.version, system, user, tokens, truncated)
+
+    @staticmethod
+    def _count_tokens(template: PromptTemplate, values: Dict, system: str, user: str, known: Dict[str, int]) -> int:
+        """Tokens in a rendered prompt, tokenizing only the parts whose count is not known"""
+        if not known:
+            return estimate_tokens(system) + estimate_tokens(user)
+        rest_system, rest_user = template.format({**values, **{field: "" for field in known}})
+        return estimate_tokens(rest_system) + estimate_tokens(rest_user) + sum(known.values())
+
+    def _record(self, version: str, tokens: int, truncated: bool):
+        with self._lock:
+            stats = self._stats[version]
+            stats["renders"] += 1
+            stats["total_tokens"] += tokens
+            stats["last_tokens"] = tokens
+            stats["max_tokens"] = max(stats["max_tokens"], tokens)
+            if truncated:
+                stats["truncations"] += 1
+
+    def report(self) -> List[Dict]:
+        """Per-template version, budget and token usage since startup"""
+        report = []
+        with self._lock:
+            for name, variants in self._templates.items():
+                active = self.get(name)
+                for template in variants.values():
+                    stats = dict(self._stats[template.version])
+                    stats["avg_tokens"] = round(stats["total_tokens"] / stats["renders"], 1) if stats["renders"] else 0
+                    report.append({
+                        "name": name,
+                        "variant": template.variant,
+                        "version": template.version,
+                        "active": template is active,
+                        "max_input_tokens": template.max_input_tokens,
+                        "static_tokens": template.static_tokens,
+                        **stats,
+                    })
+        return report
@@ -0,0 +1,119 @@
+from services.prompt_registry import PromptRegistry, PromptTemplate
+
+# Shared by every AIService instance so versions and token stats are process-wide
+prompt_registry = PromptRegistry()
+
+
+COACH_SYSTEM = "You are an expert trading coach with deep knowledge of technical analysis, risk management, and trading psychology."
+
+
+prompt_registry.register(PromptTemplate(
+    name="trade_analysis",
+    system=f"{COACH_SYSTEM} Provide detailed, actionable feedback. Always answer with a single JSON object.",
+    user="""You are an expert trading coach analyzing a trade. Provide a detailed, constructive critique.
+
+Trade Details:
+- Ticker: {ticker}
+- Direction: {direction}
+- Entry Price: ${entry:.2f}
+- Exit Price: ${exit:.2f}
+- P&L: ${pnl:.2f} ({pnl_percent:+.2f}%)
+- Setup: {setup}
+- Notes: {notes}
+- Tags: {tags}
+- Date: {date}
+
+Respond with a JSON object containing exactly these keys, each a string of one or two clear paragraphs:
+{sections}
+
+Be specific, constructive, and educational.""",
+    max_input_tokens=1500,
+    truncate_field="notes",
+))
+
+# Shorter candidate for A/B testing (PROMPT_VARIANTS="trade_analysis=concise")
+prompt_registry.register(PromptTemplate(
+    name="trade_analysis",
+    variant="concise",
+    system=f"{COACH_SYSTEM} Be concise and actionable. Always answer with a single JSON object.",
+    user="""Critique this trade.
+
+{ticker} {direction} | entry ${entry:.2f} | exit ${exit:.2f} | P&L ${pnl:.2f} ({pnl_percent:+.2f}%)
+Setup: {setup} | Tags: {tags} | Date: {date}
+Notes: {notes}
+
+Respond with a JSON object with exactly these string keys, a few sentences each:
+{sections}""",
+    max_input_tokens=1000,
+    truncate_field="notes",
+))
+
+prompt_registry.register(PromptTemplate(
+    name="full_history",
+    system=f"{COACH_SYSTEM} Provide comprehensive, actionable insights.",
+    user="""You are an expert trading coach analyzing a trader's complete trading history. Provide comprehensive insights and a personalized improvement plan.
+
+Trading Statistics:
+- Total Trades: {total_trades}
+- Winners: {winners} ({win_rate:.1f}% win rate)
+- Losers: {losers}
+- Total P&L: ${total_pnl:.2f}
+- Average Win: ${avg_win:.2f}
+- Average Loss: ${avg_loss:.2f}
+
+Setup Performance:
+{setup_analysis}
+
+Best Performing Setup: {best_setup} (${best_setup_pnl:.2f} P&L)
+Worst Performing Setup: {worst_setup} (${worst_setup_pnl:.2f} P&L)
+
+Monte Carlo Projection:
+{projection}
+
+Recent Trades Summary:
+{recent_trades}
+
+Provide a comprehensive analysis covering:
+1. Overall Performance Assessment: Evaluate the trader's performance holistically
+2. Strongest Setups: Which setups work best and why
+3. Weakest Setups: Which setups are underperforming and what might be wrong
+4. Win/Loss Analysis: Patterns in winning vs losing trades
+5. Risk Management Mistakes: Common risk management errors observed, and what the projected drawdown and risk of ruin imply
+6. Behavioral Patterns: Psychological patterns that may be affecting performance (overtrading, revenge trading, etc.)
+7. Personalized Improvement Plan: Specific, actionable steps to improve trading performance
+
+Be detailed, specific, and provide actionable advice. Format your response in clear sections with headers.""",
+    max_input_tokens=6000,
+    truncate_field="recent_trades",
+))
+
+prompt_registry.register(PromptTemplate(
+    name="chat",
+    system="""You are a helpful AI trading coach assistant. Answer questions about trading using the provided trading history as context. Be specific, educational, and actionable.
+
+Trading History:
+{trades_context}{summary_block}""",
+    user="""You are an AI trading coach assistant. The user is asking you a question about their trading.
+
+User Question: {message}{focus_block}
+
+Answer the user's question using the trading history as context. Be helpful, educational, and specific. If the question is about a specific trade, reference it. If it's about general trading advice, provide actionable insights.""",
+    max_input_tokens=12000,
+    truncate_field="trades_context",
+))
+
+prompt_registry.register(PromptTemplate(
+    name="conversation_summary",
+    system="You summarize conversations accurately and concisely.",
+    user="""Update the running summary of a conversation between a trader and their AI trading coach.
+
+Current Summary:
+{summary}
+
+New Conversation Turns:
+{transcript}
+
+Write an updated summary in under 200 words. Keep the trader's questions, the trades, tickers and setups discussed, any numbers quoted, and the advice given. Omit pleasantries.""",
+    max_input_tokens=4000,
+    truncate_field="transcript",
+))
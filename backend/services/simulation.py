@@ -0,0 +1,126 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from utils.profiling import timed
+
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+# Trades per projected path when no horizon is given
+DEFAULT_HORIZON = 100
+# Paths simulated per block; each block keeps a handful of float32 vectors of this
+# length, so memory stays flat no matter how many paths or trades are requested
+CHUNK_SIZE = 32_768
+
+
+def _percentiles(values: np.ndarray) -> Dict[str, float]:
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+@timed("analytics.simulate_equity")
+def simulate_equity(
+    returns: np.ndarray,
+    n_paths: int = 10_000,
+    horizon: Optional[int] = None,
+    starting_equity: float = 10_000.0,
+    position_fraction: float = 1.0,
+    ruin_threshold: float = 0.5,
+    seed: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Dict:
+    """
+    Bootstrap historical per-trade returns into Monte Carlo equity paths.
+
+    Each path draws `horizon` trades with replacement from `returns` and compounds
+    them on `position_fraction` of equity. A block of `chunk_size` paths is advanced
+    one trade at a time as float32 vectors, tracking running peak, trough and
+    worst drawdown, instead of materialising a paths x horizon matrix; this is
+    faster (the working set stays in cache) and bounds memory.
+
+    Args:
+        returns: Historical fractional returns per trade
+        n_paths: Number of equity paths to simulate
+        horizon: Trades per path (defaults to DEFAULT_HORIZON)
+        starting_equity: Account size at the start of every path
+        position_fraction: Fraction of equity committed to each trade
+        ruin_threshold: Drawdown from starting equity that counts as ruin (0.5 = lose half)
+        seed: Seed for reproducible results
+        chunk_size: Paths simulated per block
+
+    Returns:
+        Dict: Risk of ruin, max-drawdown distribution and final P&L percentiles
+
+    Raises:
+        ValueError: If there are no returns to sample from
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.size == 0:
+        raise ValueError("At least one closed trade is required to run a simulation")
+
+    horizon = horizon or DEFAULT_HORIZON
+    rng = np.random.default_rng(seed)
+    # Growth factor per trade; a factor <= 0 wipes the account out
+    growth = np.maximum(1.0 + returns * position_fraction, 0.0).astype(np.float32)
+    ruin_level = 1.0 - ruin_threshold
+
+    final = np.empty(n_paths)
+    max_drawdown = np.empty(n_paths)
+    ruined = 0
+
+    for start in range(0, n_paths, chunk_size):
+        size = min(chunk_size, n_paths - start)
+        # Equity relative to the start (1.0); the start is also the initial peak
+        equity = np.ones(size, dtype=np.float32)
+        peak = np.ones(size, dtype=np.float32)
+        trough = np.ones(size, dtype=np.float32)
+        worst = np.ones(size, dtype=np.float32)  # lowest equity / peak seen so far
+        draw = np.empty(size, dtype=np.float32)
+
+        for _ in range(horizon):
+            growth.take(rng.integers(0, growth.size, size=size, dtype=np.int32), out=draw)
+            np.multiply(equity, draw, out=equity)
+            np.maximum(peak, equity, out=peak)
+            np.minimum(trough, equity, out=trough)
+            np.divide(equity, peak, out=draw)
+            np.minimum(worst, draw, out=worst)
+
+        final[start:start + size] = equity
+        max_drawdown[start:start + size] = 1.0 - worst
+        ruined += int(np.count_nonzero(trough <= ruin_level))
+
+    return {
+        "paths": n_paths,
+        "horizon": horizon,
+        "history_trades": int(returns.size),
+        "starting_equity": starting_equity,
+        "position_fraction": position_fraction,
+        "ruin_threshold": ruin_threshold,
+        "risk_of_ruin": ruined / n_paths,
+        "probability_of_profit": float(np.count_nonzero(final > 1.0) / n_paths),
+        "max_drawdown": {
+            "mean": float(max_drawdown.mean()),
+            **_percentiles(max_drawdown),
+        },
+        "final_pnl": {
+            "mean": float((final.mean() - 1.0) * starting_equity),
+            **_percentiles((final - 1.0) * starting_equity),
+        },
+        "final_return_percent": _percentiles((final - 1.0) * 100),
+    }
+
+
+def describe_projection(result: Dict) -> str:
+    """Render a simulate_equity result as a few lines of prompt text"""
+    pnl = result["final_pnl"]
+    drawdown = result["max_drawdown"]
+    fraction = result["position_fraction"]
+    sizing = "full position" if fraction == 1 else f"{fraction * 100:g}% of equity"
+    return (
+        f"- {result['paths']:,} bootstrapped paths of the next {result['horizon']} trades "
+        f"({sizing} per trade, from {result['history_trades']} closed trades)\n"
+        f"- Projected P&L per ${result['starting_equity']:,.0f}: median ${pnl['p50']:,.2f}, "
+        f"5th percentile ${pnl['p5']:,.2f}, 95th percentile ${pnl['p95']:,.2f}\n"
+        f"- Probability of ending in profit: {result['probability_of_profit'] * 100:.1f}%\n"
+        f"- Max drawdown: median {drawdown['p50'] * 100:.1f}%, 95th percentile {drawdown['p95'] * 100:.1f}%\n"
+        f"- Risk of ruin (losing {result['ruin_threshold'] * 100:.0f}% of the account): {result['risk_of_ruin'] * 100:.2f}%"
+    )
@@ -1,8 +1,16 @@
 import os
+import threading
+import time
 from supabase import create_client, Client
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
+from models.trade_frame import TradeFrame
+from services.change_feed import change_feed
+from services.trade_index import TradeIndex, trade_index
+from utils.profiling import timed
+from utils.singleflight import SingleFlight
+
 
 class SupabaseService:
     """
@@ -10,6 +18,26 @@ class SupabaseService:
     Handles all CRUD operations for trades and ensures clean JSON responses.
     """
     
+    # Incremented on every successful write made through this process. Shared by all
+    # instances so caches built from get_all_trades() can tell when they are stale.
+    _data_version = 0
+    _data_version_lock = threading.Lock()
+    
+    # Coalesces concurrent identical reads across all instances
+    _flights = SingleFlight()
+    
+    # (data version, built at, frame) for the last TradeFrame built from a full fetch
+    _frame_cache: Optional[Tuple[int, float, TradeFrame]] = None
+    _frame_lock = threading.Lock()
+    
+    # Full fetches re-sync the trade index at most this often, to pick up writes made
+    # outside this process (e.g. directly in Supabase)
+    INDEX_MAX_AGE_SECONDS = 300
+    # Ids per request when fetching by id, to keep the PostgREST URL short
+    ID_BATCH_SIZE = 200
+    # Cached TradeFrames are rebuilt at least this often, to pick up outside writes
+    FRAME_MAX_AGE_SECONDS = 60
+    
     def __init__(self):
         """Initialize Supabase client with environment variables"""
         supabase_url = os.getenv("SUPABASE_URL")
@@ -21,6 +49,17 @@ class SupabaseService:
         self.supabase: Client = create_client(supabase_url, supabase_key)
         self.table_name = "trades"
 
+    @property
+    def data_version(self) -> int:
+        """Current version of the trades table as seen by this process"""
+        return SupabaseService._data_version
+
+    @classmethod
+    def _bump_data_version(cls):
+        with cls._data_version_lock:
+            cls._data_version += 1
+
+    @timed("supabase.insert_trade")
     def insert_trade(self, data: Dict) -> Dict:
         """
         Insert a new trade into the database.
@@ -45,26 +84,118 @@ class SupabaseService:
             
             result = self.supabase.table(self.table_name).insert(serialized_data).execute()
             if result.data and len(result.data) > 0:
+                self._bump_data_version()
+                trade = dict(result.data[0])
+                trade_index.upsert(trade)
+                change_feed.publish("insert", trade)
                 # Return clean dict, not raw Supabase object
-                return dict(result.data[0])
+                return trade
             raise Exception("Failed to insert trade: No data returned")
         except Exception as e:
             raise Exception(f"Supabase error inserting trade: {str(e)}")
 
+    @timed("supabase.get_all_trades")
     def get_all_trades(self) -> List[Dict]:
         """
         Get all trades from the database, ordered by date DESC.
         
+        Concurrent calls for the same data version share a single query.
+        
         Returns:
             List[Dict]: List of trades as clean dictionaries
         """
+        trades, shared = self._flights.do(("all_trades", self.data_version), self._fetch_all_trades)
+        if shared:
+            # Give each caller its own dicts so one request cannot mutate another's rows
+            return [dict(trade) for trade in trades]
+        return trades
+
+    @timed("supabase.get_trade_frame")
+    def get_trade_frame(self, trades: Optional[List[Dict]] = None, data_version: Optional[int] = None) -> TradeFrame:
+        """
+        Get a columnar TradeFrame of all trades, built once per data version.
+        
+        The frame is shared by every caller until the next write, so analytics
+        requests reuse it instead of rebuilding it (or refetching) per request.
+        
+        Args:
+            trades: Trades already fetched by the caller, to build from on a cache miss
+            data_version: The data_version read before fetching `trades`; required with trades
+            
+        Returns:
+            TradeFrame: Frame for the given (or current) data version; must not be mutated
+        """
+        if trades is None or data_version is None:
+            trades, data_version = None, self.data_version
+        cached = SupabaseService._frame_cache
+        if (
+            cached is not None
+            and cached[0] == data_version
+            and time.monotonic() - cached[1] <= self.FRAME_MAX_AGE_SECONDS
+        ):
+            return cached[2]
+        frame, _ = self._flights.do(("trade_frame", data_version), self._build_trade_frame, trades, data_version)
+        return frame
+
+    def _build_trade_frame(self, trades: Optional[List[Dict]], data_version: int) -> TradeFrame:
+        frame = TradeFrame.from_trades(trades if trades is not None else self.get_all_trades())
+        with self._frame_lock:
+            cached = SupabaseService._frame_cache
+            if cached is None or cached[0] <= data_version:
+                SupabaseService._frame_cache = (data_version, time.monotonic(), frame)
+        return frame
+
+    @timed("supabase.fetch_all_trades")
+    def _fetch_all_trades(self) -> List[Dict]:
         try:
+            # Read before the query so a write indexed meanwhile makes the rebuild back off
+            index_generation = trade_index.generation
             result = self.supabase.table(self.table_name).select("*").order("date", desc=True).execute()
-            # Convert to clean dicts
-            return [dict(trade) for trade in (result.data if result.data else [])]
+            # PostgREST already returns plain dicts; avoid copying every row
+            trades = result.data if result.data else []
+            if trade_index.is_stale(self.INDEX_MAX_AGE_SECONDS):
+                trade_index.rebuild(trades, generation=index_generation)
+            return trades
         except Exception as e:
             raise Exception(f"Supabase error fetching trades: {str(e)}")
 
+    def get_trade_index(self) -> TradeIndex:
+        """
+        Get the tag/setup/ticker index, building it from a full fetch if needed.
+        
+        Returns:
+            TradeIndex: The shared, up-to-date trade index
+        """
+        if trade_index.is_stale(self.INDEX_MAX_AGE_SECONDS):
+            self.get_all_trades()
+            if not trade_index.is_built:
+                # A write overtook the first build, which was skipped; fetch again now that it is indexed
+                self.get_all_trades()
+        return trade_index
+
+    @timed("supabase.get_trades_by_ids")
+    def get_trades_by_ids(self, trade_ids: List[str]) -> List[Dict]:
+        """
+        Get several trades by ID, ordered by date DESC.
+        
+        Args:
+            trade_ids: UUID strings of the trades
+            
+        Returns:
+            List[Dict]: Trades found, as clean dictionaries
+        """
+        try:
+            trades = []
+            for start in range(0, len(trade_ids), self.ID_BATCH_SIZE):
+                batch = trade_ids[start:start + self.ID_BATCH_SIZE]
+                result = self.supabase.table(self.table_name).select("*").in_("id", batch).execute()
+                trades.extend(dict(trade) for trade in (result.data if result.data else []))
+            trades.sort(key=lambda trade: trade.get("date") or "", reverse=True)
+            return trades
+        except Exception as e:
+            raise Exception(f"Supabase error fetching trades: {str(e)}")
+
+    @timed("supabase.get_trade_by_id")
     def get_trade_by_id(self, trade_id: str) -> Optional[Dict]:
         """
         Get a single trade by ID.
@@ -84,6 +215,7 @@ class SupabaseService:
         except Exception as e:
             raise Exception(f"Supabase error fetching trade: {str(e)}")
 
+    @timed("supabase.update_trade")
     def update_trade(self, trade_id: str, data: Dict) -> Optional[Dict]:
         """
         Update a trade by ID.
@@ -106,12 +238,17 @@ class SupabaseService:
             
             result = self.supabase.table(self.table_name).update(serialized_data).eq("id", trade_id).execute()
             if result.data and len(result.data) > 0:
+                self._bump_data_version()
+                trade = dict(result.data[0])
+                trade_index.upsert(trade)
+                change_feed.publish("update", trade)
                 # Return clean dict
-                return dict(result.data[0])
+                return trade
             return None
         except Exception as e:
             raise Exception(f"Supabase error updating trade: {str(e)}")
 
+    @timed("supabase.delete_trade")
     def delete_trade(self, trade_id: str) -> bool:
         """
         Delete a trade by ID.
@@ -124,27 +261,43 @@ class SupabaseService:
         """
         try:
             result = self.supabase.table(self.table_name).delete().eq("id", trade_id).execute()
-            # Supabase delete returns empty data array on success
+            self._bump_data_version()
+            trade_index.remove(trade_id)
+            # Deleted rows are returned when available; they carry the owner for fan-out
+            deleted = result.data[0] if result.data else {"user_id": None}
+            change_feed.publish("delete", {"id": trade_id, "user_id": deleted.get("user_id")})
             return True
         except Exception as e:
             raise Exception(f"Supabase error deleting trade: {str(e)}")
 
-    def update_ai_feedback(self, trade_id: str, feedback: str) -> Optional[Dict]:
+    @timed("supabase.update_ai_feedback")
+    def update_ai_feedback(self, trade_id: str, feedback: Dict[str, str], version: Optional[str] = None) -> Optional[Dict]:
         """
-        Update the AI feedback field for a trade.
+        Update the structured AI feedback for a trade.
+        
+        The legacy free-text ai_feedback column is cleared so it cannot go stale.
         
         Args:
             trade_id: UUID string of the trade
-            feedback: AI-generated feedback string
+            feedback: AI-generated feedback by section
+            version: Version id of the prompt template that produced the feedback
             
         Returns:
             Optional[Dict]: Updated trade as a clean dictionary, or None if not found
         """
         try:
-            result = self.supabase.table(self.table_name).update({"ai_feedback": feedback}).eq("id", trade_id).execute()
+            result = self.supabase.table(self.table_name).update({
+                "ai_feedback": None,
+                "ai_feedback_sections": feedback,
+                "ai_feedback_version": version,
+            }).eq("id", trade_id).execute()
             if result.data and len(result.data) > 0:
+                self._bump_data_version()
+                trade = dict(result.data[0])
+                # Late-arriving feedback reaches clients as a row update
+                change_feed.publish("update", trade)
                 # Return clean dict
-                return dict(result.data[0])
+                return trade
             return None
         except Exception as e:
             raise Exception(f"Supabase error updating AI feedback: {str(e)}")
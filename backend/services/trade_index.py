@@ -0,0 +1,231 @@
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+FACETS = ("tag", "setup", "ticker")
+
+# Tickers are only matched in free text when written with a $ prefix or as a
+# capitalized word of 2+ letters, so ordinary words like "on", "I" or "a" are not
+# mistaken for symbols
+_TICKER_PATTERN = re.compile(r"\$[A-Z][A-Z.]{0,9}\b|\b[A-Z][A-Z.]{1,9}\b")
+
+
+@lru_cache(maxsize=4096)
+def _term_pattern(key: str) -> "re.Pattern":
+    """Whole-word pattern for a tag or setup, so "on" does not match "only" """
+    return re.compile(rf"(?<!\w){re.escape(key)}(?!\w)")
+
+
+def _normalize(facet: str, value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    return value.upper() if facet == "ticker" else value.lower()
+
+
+def _bits_to_slots(bits: int) -> Iterable[int]:
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class TradeIndex:
+    """
+    Inverted index from tag, setup and ticker to trade ids.
+
+    Each trade gets a dense slot number and every posting list is a bitset (a Python
+    int with one bit per slot), so AND/OR filters are single bitwise operations.
+    The index is built from a full fetch and then kept current by the
+    SupabaseService write methods. Every write bumps `generation`, so a rebuild
+    from a fetch that a write may have overtaken can be recognised and skipped.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.generation = 0
+        self._clear()
+
+    def _clear(self):
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._terms: Dict[int, List[Tuple[str, str]]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        self.built_at: Optional[float] = None
+
+    @property
+    def is_built(self) -> bool:
+        return self.built_at is not None
+
+    def is_stale(self, max_age_seconds: float) -> bool:
+        """True if the index was never built or was built longer ago than max_age_seconds"""
+        return self.built_at is None or time.monotonic() - self.built_at > max_age_seconds
+
+    def rebuild(self, trades: List[Dict], generation: Optional[int] = None) -> bool:
+        """
+        Replace the index contents with the given trades.
+
+        generation is the value of `generation` read before the trades were fetched;
+        if a write has been indexed since, the trades may predate it and the rebuild
+        is skipped (returning False) so it cannot undo that write.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._clear()
+            for trade in trades:
+                self._add(trade)
+            self.built_at = time.monotonic()
+            return True
+
+    def upsert(self, trade: Dict):
+        """Index a new trade or re-index an updated one"""
+        if not trade or not trade.get("id"):
+            return
+        with self._lock:
+            self.generation += 1
+            self._remove(str(trade["id"]))
+            self._add(trade)
+
+    def remove(self, trade_id: str):
+        """Drop a trade from the index"""
+        with self._lock:
+            self.generation += 1
+            self._remove(str(trade_id))
+
+    def _add(self, trade: Dict):
+        trade_id = str(trade["id"])
+        slot = self._free.pop() if self._free else len(self._ids)
+        if slot == len(self._ids):
+            self._ids.append(trade_id)
+        else:
+            self._ids[slot] = trade_id
+        self._slots[trade_id] = slot
+
+        terms = []
+        for tag in trade.get("tags") or []:
+            terms.append(("tag", _normalize("tag", tag)))
+        terms.append(("setup", _normalize("setup", trade.get("setup"))))
+        terms.append(("ticker", _normalize("ticker", trade.get("ticker"))))
+
+        bit = 1 << slot
+        kept = []
+        for facet, key in terms:
+            if key is None:
+                continue
+            postings = self._postings[facet]
+            postings[key] = postings.get(key, 0) | bit
+            kept.append((facet, key))
+        self._terms[slot] = kept
+
+    def _remove(self, trade_id: str):
+        slot = self._slots.pop(trade_id, None)
+        if slot is None:
+            return
+        mask = ~(1 << slot)
+        for facet, key in self._terms.pop(slot, []):
+            postings = self._postings[facet]
+            remaining = postings.get(key, 0) & mask
+            if remaining:
+                postings[key] = remaining
+            else:
+                postings.pop(key, None)
+        self._ids[slot] = None
+        self._free.append(slot)
+
+    def _any_of(self, facet: str, values: Iterable[str]) -> int:
+        bits = 0
+        postings = self._postings[facet]
+        for value in values:
+            key = _normalize(facet, value)
+            if key is not None:
+                bits |= postings.get(key, 0)
+        return bits
+
+    def _all_of(self, facet: str, values: Iterable[str]) -> int:
+        bits = None
+        postings = self._postings[facet]
+        for value in values:
+            key = _normalize(facet, value)
+            if key is None:
+                continue
+            term_bits = postings.get(key, 0)
+            bits = term_bits if bits is None else bits & term_bits
+        return bits or 0
+
+    def query(
+        self,
+        tags: Optional[List[str]] = None,
+        setups: Optional[List[str]] = None,
+        tickers: Optional[List[str]] = None,
+        tags_mode: str = "all",
+    ) -> List[str]:
+        """
+        Find trade ids matching the given filters.
+
+        Facets are combined with AND; within setups and tickers values are OR'd,
+        and tags are AND'd or OR'd depending on tags_mode.
+
+        Args:
+            tags: Tags to match
+            setups: Setups to match (any of)
+            tickers: Tickers to match (any of)
+            tags_mode: "all" to require every tag, "any" to require at least one
+
+        Returns:
+            List[str]: Matching trade ids (unordered)
+        """
+        if tags_mode not in ("all", "any"):
+            raise ValueError("tags_mode must be either 'all' or 'any'")
+
+        with self._lock:
+            result = None
+            if tags:
+                result = self._all_of("tag", tags) if tags_mode == "all" else self._any_of("tag", tags)
+            if setups:
+                bits = self._any_of("setup", setups)
+                result = bits if result is None else result & bits
+            if tickers:
+                bits = self._any_of("ticker", tickers)
+                result = bits if result is None else result & bits
+            if not result:
+                return []
+            return [self._ids[slot] for slot in _bits_to_slots(result)]
+
+    def match_text(self, text: str) -> List[str]:
+        """
+        Find trade ids for the tags, setups and tickers mentioned in free text.
+
+        Used to pull the trades a chat question is about, e.g. "breakout trades on
+        AAPL" matches trades tagged or set up as breakout AND on AAPL.
+
+        Returns:
+            List[str]: Matching trade ids, empty if no indexed term is mentioned
+        """
+        if not text:
+            return []
+        lowered = text.lower()
+        symbols = {symbol.lstrip("$").rstrip(".") for symbol in _TICKER_PATTERN.findall(text)}
+        with self._lock:
+            tags = [key for key in self._postings["tag"] if key in lowered and _term_pattern(key).search(lowered)]
+            setups = [key for key in self._postings["setup"] if key in lowered and _term_pattern(key).search(lowered)]
+            tickers = [symbol for symbol in symbols if symbol in self._postings["ticker"]]
+            if not (tags or setups or tickers):
+                return []
+            # Tags and setups are both ways of naming a strategy, so treat them as one facet
+            strategy = self._any_of("tag", tags) | self._any_of("setup", setups) if (tags or setups) else None
+            result = strategy
+            if tickers:
+                bits = self._any_of("ticker", tickers)
+                result = bits if result is None else result & bits
+            return [self._ids[slot] for slot in _bits_to_slots(result or 0)]
+
+
+# Shared by all SupabaseService instances so every write path maintains one index
+trade_index = TradeIndex()
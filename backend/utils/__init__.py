@@ -0,0 +1,2 @@
+# Utils package
+
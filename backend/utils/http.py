@@ -0,0 +1,150 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+# orjson and brotli are optional: fall back to the stdlib encoder and to gzip-only
+# negotiation when they are not installed.
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+# Bodies smaller than this are sent uncompressed; the framing overhead is not worth it
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Encode a JSON-compatible object to UTF-8 bytes using the fastest available encoder.
+
+    Args:
+        data: Object to encode (dicts, lists, strings, numbers, dates, UUIDs)
+
+    Returns:
+        bytes: Encoded JSON document
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def compute_etag(body: bytes) -> str:
+    """
+    Build a weak ETag from the uncompressed response body.
+
+    The tag is weak because the same representation may be sent with different
+    content encodings.
+    """
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag using weak comparison"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content encoding from an Accept-Encoding header.
+
+    Prefers brotli (when installed) over gzip and honours q=0 exclusions.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        pieces = part.strip().split(";")
+        coding = pieces[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in pieces[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+
+    def _q(coding: str) -> float:
+        return accepted.get(coding, accepted.get("*", 0.0))
+
+    if brotli is not None and _q("br") > 0:
+        return "br"
+    if _q("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def json_response(
+    request: Request,
+    body: bytes,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Build a JSON response with ETag revalidation and content-encoding negotiation.
+
+    - Returns 304 Not Modified when If-None-Match matches the body's ETag
+    - Compresses with brotli or gzip depending on Accept-Encoding
+
+    Args:
+        request: Incoming request (used for If-None-Match and Accept-Encoding)
+        body: Pre-encoded JSON body
+        status_code: Status code for a full response
+        headers: Extra headers to include
+
+    Returns:
+        Response: Ready-to-send response
+    """
+    etag = compute_etag(body)
+    response_headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if headers:
+        response_headers.update(headers)
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=response_headers)
+
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encoding = _choose_encoding(request.headers.get("accept-encoding"))
+        if encoding == "br":
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            response_headers["Content-Encoding"] = "br"
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            response_headers["Content-Encoding"] = "gzip"
+
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers=response_headers,
+    )
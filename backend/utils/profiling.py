@@ -0,0 +1,407 @@
+import asyncio
+import functools
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+
+
+# Header that forces a profile to be captured for one request
+DEBUG_HEADER = "x-debug-profile"
+# Response header carrying the id of a captured profile
+PROFILE_ID_HEADER = "x-profile-id"
+
+# Stack frames kept per sample, counted from the innermost frame
+MAX_STACK_DEPTH = 64
+
+
+def profiling_requested() -> bool:
+    """True when PROFILING_ENABLED=1 is set, whether or not a token is configured"""
+    return os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+
+
+def profiling_token() -> Optional[str]:
+    """Token required by the debug header and the admin endpoints (PROFILING_TOKEN)"""
+    return os.getenv("PROFILING_TOKEN") or None
+
+
+def profiling_enabled() -> bool:
+    """
+    Profiling is opt-in and needs both PROFILING_ENABLED=1 and PROFILING_TOKEN.
+
+    Profiles expose request paths, query strings and stack samples, so they are
+    never collected without a token to protect them.
+    """
+    return profiling_requested() and profiling_token() is not None
+
+
+def token_matches(value: Optional[str]) -> bool:
+    """Constant-time check of a caller-supplied value against PROFILING_TOKEN"""
+    token = profiling_token()
+    return bool(token and value) and hmac.compare_digest(value.encode(), token.encode())
+
+
+def slow_request_ms() -> float:
+    """Requests slower than this (PROFILING_SLOW_MS, default 1000) are captured"""
+    return float(os.getenv("PROFILING_SLOW_MS", "1000"))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+def _stack(frame) -> Tuple[str, ...]:
+    """Labels of a thread's frames, outermost first, without this module's wrappers"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        if frame.f_code.co_filename != __file__:
+            labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+class RequestProfile:
+    """
+    Timings and stack samples collected for one request.
+
+    Stages are named spans recorded by `stage`/`timed` around service calls;
+    samples are the call stacks of the request's worker thread, taken every
+    SAMPLE_INTERVAL seconds while the endpoint runs.
+    """
+
+    def __init__(self, method: str, path: str, query: str = ""):
+        self.id: Optional[int] = None
+        self.method = method
+        self.path = path
+        self.query = query
+        self.started_at = datetime.now(timezone.utc)
+        self.status_code: Optional[int] = None
+        self.trigger: Optional[str] = None
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+        self._lock = threading.Lock()
+        self.stages: List[Dict] = []
+        self.samples: Counter = Counter()
+
+    def elapsed_ms(self) -> float:
+        end = self._end if self._end is not None else time.perf_counter()
+        return (end - self._start) * 1000
+
+    def finish(self):
+        """Stop the request clock; later calls keep the first end time"""
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    def add_stage(self, name: str, start: float, end: float, depth: int):
+        with self._lock:
+            self.stages.append({
+                "name": name,
+                "start_ms": round((start - self._start) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+                "depth": depth,
+                "thread": threading.current_thread().name,
+            })
+
+    def add_sample(self, stack: Tuple[str, ...]):
+        with self._lock:
+            self.samples[stack] += 1
+
+    def summary(self) -> Dict:
+        """Short description for listings"""
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "duration_ms": round(self.elapsed_ms(), 3),
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+        }
+
+    def _snapshot(self) -> Tuple[List[Dict], Counter]:
+        with self._lock:
+            return list(self.stages), Counter(self.samples)
+
+    def stage_totals(self) -> List[Dict]:
+        """Calls, inclusive total and max time per stage name, slowest first"""
+        stages, _ = self._snapshot()
+        totals: Dict[str, Dict] = {}
+        for entry in stages:
+            stats = totals.setdefault(entry["name"], {"name": entry["name"], "calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["calls"] += 1
+            stats["total_ms"] += entry["duration_ms"]
+            stats["max_ms"] = max(stats["max_ms"], entry["duration_ms"])
+        for stats in totals.values():
+            stats["total_ms"] = round(stats["total_ms"], 3)
+        return sorted(totals.values(), key=lambda stats: stats["total_ms"], reverse=True)
+
+    def hot_functions(self, limit: int = 25) -> Dict[str, List[Dict]]:
+        """
+        Functions by sample count.
+
+        "self" counts samples where the function was executing, "cumulative"
+        samples where it was anywhere on the stack.
+        """
+        _, samples = self._snapshot()
+        total = sum(samples.values()) or 1
+        own: Counter = Counter()
+        cumulative: Counter = Counter()
+        for stack, count in samples.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                cumulative[label] += count
+
+        def _rows(counter: Counter) -> List[Dict]:
+            return [
+                {"function": label, "samples": count, "percent": round(count / total * 100, 1)}
+                for label, count in counter.most_common(limit)
+            ]
+
+        return {"self": _rows(own), "cumulative": _rows(cumulative)}
+
+    def folded_stacks(self) -> str:
+        """Samples in collapsed-stack format ("a;b;c 12"), as read by flame graph tools"""
+        _, samples = self._snapshot()
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in samples.most_common())
+
+    def to_dict(self) -> Dict:
+        duration_ms = self.elapsed_ms()
+        stages, samples = self._snapshot()
+        top_level_ms = sum(entry["duration_ms"] for entry in stages if entry["depth"] == 0)
+        return {
+            **self.summary(),
+            "query": self.query,
+            "stage_totals": self.stage_totals(),
+            # Request time not covered by any instrumented stage (routing, validation
+            # and encoding in the endpoint, middleware)
+            "unstaged_ms": round(max(duration_ms - top_level_ms, 0.0), 3),
+            "stages": sorted(stages, key=lambda entry: entry["start_ms"]),
+            "sampling": {
+                "interval_ms": _sampler.interval * 1000,
+                "samples": sum(samples.values()),
+                "hot_functions": self.hot_functions(),
+            },
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+_stage_depth: ContextVar[int] = ContextVar("stage_depth", default=0)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as a named stage of the current request's profile.
+
+    A no-op outside a profiled request, so it is safe to leave in hot paths.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    depth = _stage_depth.get()
+    token = _stage_depth.set(depth + 1)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_stage(name, start, time.perf_counter(), depth)
+        _stage_depth.reset(token)
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of `stage` for service methods"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_profile.get() is None:
+                return fn(*args, **kwargs)
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Sampler:
+    """
+    Background thread that samples the stacks of threads running profiled requests.
+
+    cProfile only sees the thread it is enabled on, while sync endpoints run in
+    the threadpool; sampling sys._current_frames() covers the worker thread
+    without tracing every call. The thread sleeps while nothing is attached.
+    """
+
+    SAMPLE_INTERVAL = 0.005
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._targets: Dict[int, RequestProfile] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def attach(self, profile: RequestProfile):
+        """Sample the calling thread into profile until detach()"""
+        with self._lock:
+            self._targets[threading.get_ident()] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def detach(self):
+        with self._lock:
+            self._targets.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                targets = list(self._targets.items())
+                if not targets:
+                    self._wake.clear()
+            if not targets:
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            for thread_id, profile in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.add_sample(_stack(frame))
+            del frames
+            time.sleep(self.interval)
+
+
+_sampler = _Sampler()
+
+
+class ProfileStore:
+    """Ring buffer of the most recent captured profiles"""
+
+    MAX_PROFILES = 50
+
+    def __init__(self, max_profiles: int = MAX_PROFILES):
+        self._lock = threading.Lock()
+        self._profiles: Deque[RequestProfile] = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+
+    def add(self, profile: RequestProfile) -> int:
+        with self._lock:
+            profile.id = next(self._ids)
+            self._profiles.append(profile)
+            return profile.id
+
+    def list(self) -> List[RequestProfile]:
+        """Captured profiles, newest first"""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore()
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route class that samples the worker thread of sync endpoints during profiled requests.
+
+    Async endpoints share the event loop thread with every other request, so only
+    their stage timings are recorded.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = self._sampled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _sampled(endpoint: Callable) -> Callable:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            profile = _current_profile.get()
+            if profile is None:
+                return endpoint(*args, **kwargs)
+            _sampler.attach(profile)
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _sampler.detach()
+        return wrapper
+
+
+class ProfilingMiddleware:
+    """
+    Capture profiles of slow requests and of requests sent with X-Debug-Profile.
+
+    Every request is profiled while it runs; the profile is kept in the ring
+    buffer only if its time to the response headers reaches the slow threshold or
+    the debug header asked for it, and the response then carries X-Profile-Id.
+    The debug header must carry PROFILING_TOKEN as its value.
+    Streaming responses are measured up to their headers.
+    """
+
+    def __init__(self, app, store: ProfileStore = profile_store, slow_ms: Optional[float] = None):
+        self.app = app
+        self.store = store
+        self.slow_ms = slow_request_ms() if slow_ms is None else slow_ms
+
+    def _forced(self, scope) -> bool:
+        value = dict(scope["headers"]).get(DEBUG_HEADER.encode())
+        return token_matches(value.decode("latin-1")) if value else False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/admin"):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], scope.get("query_string", b"").decode())
+        forced = self._forced(scope)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                profile.finish()
+                profile.status_code = message["status"]
+                if self._capture(profile, forced):
+                    message = {
+                        **message,
+                        "headers": [*message.get("headers", []), (PROFILE_ID_HEADER.encode(), str(profile.id).encode())],
+                    }
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _current_profile.reset(token)
+            if profile.status_code is None:
+                # The app raised before sending a response
+                profile.finish()
+                profile.status_code = 500
+                self._capture(profile, forced)
+
+    def _capture(self, profile: RequestProfile, forced: bool) -> bool:
+        if forced:
+            profile.trigger = "header"
+        elif profile.elapsed_ms() >= self.slow_ms:
+            profile.trigger = "slow"
+        else:
+            return False
+        self.store.add(profile)
+        return True
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Dict, List
+
+# tiktoken is optional: cl100k_base is close to the Llama 3 vocabulary and runs
+# locally once its BPE file is cached. Without it we fall back to a heuristic.
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover
+    tiktoken = None
+
+
+TOKENIZER_ENCODING = "cl100k_base"
+# tiktoken downloads this file on first use (with no timeout) and caches it under
+# TIKTOKEN_CACHE_DIR keyed by the SHA-1 of the URL. We only load the tokenizer when
+# that cached copy exists, so token counting never touches the network.
+TOKENIZER_BPE_URL = "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+# Rough average for English prose and JSON with Llama-family tokenizers
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def tokenizer_cache_path() -> str:
+    """Where tiktoken looks for the cached cl100k_base BPE file"""
+    cache_dir = (
+        os.getenv("TIKTOKEN_CACHE_DIR")
+        or os.getenv("DATA_GYM_CACHE_DIR")
+        or os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    )
+    return os.path.join(cache_dir, hashlib.sha1(TOKENIZER_BPE_URL.encode()).hexdigest())
+
+
+def _get_encoding():
+    """Load the tokenizer once, from the local cache only; remember failures so we never retry per call"""
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            if tiktoken is not None:
+                path = tokenizer_cache_path()
+                if not os.path.exists(path):
+                    print(f"Warning: tokenizer file not found at {path}, estimating tokens from length")
+                else:
+                    try:
+                        _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                    except Exception as e:
+                        print(f"Warning: tokenizer unavailable, estimating tokens from length: {str(e)}")
+            _encoding_loaded = True
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Count (or estimate, without a tokenizer) the number of tokens in a piece of text"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(messages: List[Dict]) -> int:
+    """Estimate the tokens used by a list of chat messages ({"role", "content"})"""
+    # ~4 tokens of framing per message for role/separators
+    return sum(estimate_tokens(m.get("content", "")) + 4 for m in messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "\n...[truncated]") -> str:
+    """
+    Cut text down to at most max_tokens tokens, appending a marker when truncated.
+
+    Args:
+        text: Text to truncate
+        max_tokens: Token budget for the result, marker included
+        marker: Suffix signalling to the model that content was cut
+
+    Returns:
+        str: The original text if it fits, otherwise a truncated copy
+    """
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    keep = max(max_tokens - estimate_tokens(marker), 0)
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:keep]) + marker
+    return text[:keep * CHARS_PER_TOKEN] + marker
@@ -1,18 +1,44 @@
 import { api } from "./client";
+import type { FeedbackSection } from "./trades";
+
+export type FeedbackSections = Partial<Record<FeedbackSection, string>>;
 
 export interface AnalyzeRequest {
   trade_id: string;
+  sections?: FeedbackSection[];
 }
 
 export interface AnalyzeResponse {
   trade_id: string;
-  analysis: string;
+  analysis: FeedbackSections;
+  version: string;
+}
+
+export interface FeedbackResponse {
+  trade_id: string;
+  version: string | null;
+  sections: FeedbackSections;
 }
 
-export const analyzeTrade = async (tradeId: string): Promise<string> => {
+export const analyzeTrade = async (
+  tradeId: string,
+  sections?: FeedbackSection[]
+): Promise<FeedbackSections> => {
   const response = await api.post<AnalyzeResponse>("/ai/analyze", {
     trade_id: tradeId,
+    sections,
   });
   return response.data.analysis;
 };
 
+export const getFeedback = async (
+  tradeId: string,
+  sections?: FeedbackSection[]
+): Promise<FeedbackSections> => {
+  const response = await api.get<FeedbackResponse>(`/ai/feedback/${tradeId}`, {
+    params: sections ? { sections } : undefined,
+    paramsSerializer: { indexes: null },
+  });
+  return response.data.sections;
+};
+
@@ -3,16 +3,26 @@ import { api } from "./client";
 export interface ChatMessage {
   message: string;
   user_id?: string | null;
+  session_id?: string | null;
 }
 
 export interface ChatResponse {
   response: string;
+  session_id: string;
 }
 
-export const sendMessage = async (message: string): Promise<string> => {
+export const sendMessage = async (
+  message: string,
+  sessionId?: string | null
+): Promise<ChatResponse> => {
   const response = await api.post<ChatResponse>("/chat", {
     message,
+    session_id: sessionId ?? null,
   });
-  return response.data.response;
+  return response.data;
+};
+
+export const deleteChatSession = async (sessionId: string): Promise<void> => {
+  await api.delete(`/chat/${sessionId}`);
 };
 
@@ -13,8 +13,59 @@ export interface Trade {
   user_id: string | null;
   created_at: string;
   ai_feedback: string | null;
+  ai_feedback_sections?: Partial<Record<FeedbackSection, string>> | null;
+  ai_feedback_version?: string | null;
 }
 
+export type FeedbackSection =
+  | "execution"
+  | "setup"
+  | "risk"
+  | "psychology"
+  | "went_well"
+  | "improvements"
+  | "takeaways";
+
+export const FEEDBACK_SECTION_TITLES: Record<FeedbackSection, string> = {
+  execution: "Trade Execution",
+  setup: "Setup Quality",
+  risk: "Risk Management",
+  psychology: "Psychology",
+  went_well: "What Went Well",
+  improvements: "What Could Be Improved",
+  takeaways: "Key Takeaways",
+};
+
+/** Full AI feedback as text: structured sections when present, else legacy free text */
+export const formatFeedback = (trade: Trade): string | null => {
+  const sections = trade.ai_feedback_sections;
+  if (sections) {
+    const parts = (Object.keys(FEEDBACK_SECTION_TITLES) as FeedbackSection[])
+      .filter((name) => sections[name])
+      .map((name) => `${FEEDBACK_SECTION_TITLES[name]}\n${sections[name]}`);
+    if (parts.length > 0) return parts.join("\n\n");
+  }
+  return trade.ai_feedback;
+};
+
+/** Sections to download for trade lists; full feedback is loaded when a trade is opened */
+export const PREVIEW_FEEDBACK_SECTIONS: FeedbackSection[] = ["takeaways"];
+
+/** Copy of a trade with ai_feedback_sections trimmed to the given sections */
+export const pickFeedbackSections = (trade: Trade, sections: FeedbackSection[]): Trade => {
+  const feedback = trade.ai_feedback_sections;
+  if (!feedback) return trade;
+  const picked: Partial<Record<FeedbackSection, string>> = {};
+  sections.forEach((name) => {
+    if (feedback[name]) picked[name] = feedback[name];
+  });
+  return { ...trade, ai_feedback_sections: picked };
+};
+
+/** Short AI feedback for previews: the key takeaways when available */
+export const feedbackSummary = (trade: Trade): string | null =>
+  trade.ai_feedback_sections?.takeaways || trade.ai_feedback;
+
 export interface TradeCreate {
   ticker: string;
   entry: number;
@@ -37,9 +88,19 @@ export interface TradeUpdate {
   date?: string;
 }
 
-export const getTrades = async (): Promise<Trade[]> => {
-  const response = await api.get<Trade[]>("/trades");
-  return response.data;
+export interface TradesSnapshot {
+  trades: Trade[];
+  /** Change-feed position of the snapshot; stream changes with since=seq */
+  seq: number | null;
+}
+
+export const getTrades = async (sections?: FeedbackSection[]): Promise<TradesSnapshot> => {
+  const response = await api.get<Trade[]>("/trades", {
+    params: sections ? { sections } : undefined,
+    paramsSerializer: { indexes: null },
+  });
+  const seq = response.headers["x-change-seq"];
+  return { trades: response.data, seq: seq != null ? Number(seq) : null };
 };
 
 export const getTrade = async (id: string): Promise<Trade> => {
@@ -61,3 +122,36 @@ export const deleteTrade = async (id: string): Promise<void> => {
   await api.delete(`/trades/${id}`);
 };
 
+
+export type TradeChange =
+  | { type: "insert" | "update"; seq: number; trade: Trade }
+  | { type: "delete"; seq: number; trade: Pick<Trade, "id"> }
+  | { type: "reset"; seq: number };
+
+/**
+ * Subscribe to row-level trade changes over Server-Sent Events.
+ * EventSource reconnects on its own and resumes via Last-Event-ID.
+ * Returns a function that closes the stream.
+ */
+export const subscribeToTradeChanges = (
+  onChange: (change: TradeChange) => void,
+  since?: number | null
+): (() => void) => {
+  const query = since != null ? `?since=${since}` : "";
+  const source = new EventSource(`${api.defaults.baseURL}/trades/changes${query}`);
+
+  const handle = (type: TradeChange["type"]) => (event: MessageEvent) => {
+    const seq = Number(event.lastEventId);
+    if (type === "reset") {
+      onChange({ type, seq });
+    } else {
+      onChange({ type, seq, trade: JSON.parse(event.data) } as TradeChange);
+    }
+  };
+
+  (["insert", "update", "delete", "reset"] as const).forEach((type) =>
+    source.addEventListener(type, handle(type) as EventListener)
+  );
+
+  return () => source.close();
+};
@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { sendMessage } from "@/api/chat";
+import { sendMessage, deleteChatSession } from "@/api/chat";
 import { useToast } from "@/hooks/use-toast";
 
 export interface Message {
@@ -12,6 +12,7 @@ export interface Message {
 export function useChat() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [loading, setLoading] = useState(false);
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const { toast } = useToast();
 
   const sendChatMessage = async (content: string) => {
@@ -28,11 +29,12 @@ export function useChat() {
     setLoading(true);
 
     try {
-      const response = await sendMessage(content);
+      const response = await sendMessage(content, sessionId);
+      setSessionId(response.session_id);
       const aiMessage: Message = {
         id: (Date.now() + 1).toString(),
         role: "assistant",
-        content: response,
+        content: response.response,
         timestamp: new Date(),
       };
       setMessages((prev) => [...prev, aiMessage]);
@@ -50,6 +52,11 @@ export function useChat() {
 
   const clearMessages = () => {
     setMessages([]);
+    if (sessionId) {
+      // Best effort: the server also expires idle sessions on its own
+      deleteChatSession(sessionId).catch(() => undefined);
+      setSessionId(null);
+    }
   };
 
   return {
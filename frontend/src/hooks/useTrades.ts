@@ -1,21 +1,48 @@
-import { useState, useEffect } from "react";
-import { getTrades, createTrade, updateTrade, deleteTrade, Trade, TradeCreate, TradeUpdate } from "@/api/trades";
+import { useState, useEffect, useRef } from "react";
+import {
+  getTrades,
+  createTrade,
+  updateTrade,
+  deleteTrade,
+  subscribeToTradeChanges,
+  pickFeedbackSections,
+  FeedbackSection,
+  Trade,
+  TradeChange,
+  TradeCreate,
+  TradeUpdate,
+} from "@/api/trades";
 import { useToast } from "@/hooks/use-toast";
 
 export type { Trade } from "@/api/trades";
 
-export function useTrades() {
+/**
+ * Trades with live updates. Pass feedbackSections to download only those AI
+ * feedback sections (e.g. PREVIEW_FEEDBACK_SECTIONS for lists).
+ */
+export function useTrades(feedbackSections?: FeedbackSection[]) {
   const [trades, setTrades] = useState<Trade[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const { toast } = useToast();
+  // Closes the current change stream; replaced on every resync
+  const unsubscribeRef = useRef<(() => void) | null>(null);
+  const syncIdRef = useRef(0);
 
   const fetchTrades = async () => {
+    // Stop applying deltas while the snapshot loads; they resume from its position
+    const syncId = ++syncIdRef.current;
+    unsubscribeRef.current?.();
+    unsubscribeRef.current = null;
     try {
       setLoading(true);
       setError(null);
-      const data = await getTrades();
+      const { trades: data, seq } = await getTrades(feedbackSections);
+      if (syncId !== syncIdRef.current) return;
       setTrades(data);
+      // Apply server-side changes made after the snapshot (including AI feedback
+      // that arrives later) as deltas
+      unsubscribeRef.current = subscribeToTradeChanges(applyChange, seq);
     } catch (err) {
       const message = err instanceof Error ? err.message : "Failed to fetch trades";
       setError(message);
@@ -25,7 +52,7 @@ export function useTrades() {
         description: message,
       });
     } finally {
-      setLoading(false);
+      if (syncId === syncIdRef.current) setLoading(false);
     }
   };
 
@@ -91,8 +118,36 @@ export function useTrades() {
     }
   };
 
+  const applyChange = (change: TradeChange) => {
+    if (change.type !== "reset" && change.type !== "delete" && feedbackSections) {
+      change = { ...change, trade: pickFeedbackSections(change.trade, feedbackSections) };
+    }
+    switch (change.type) {
+      case "insert":
+        setTrades((prev) =>
+          prev.some((t) => t.id === change.trade.id) ? prev : [change.trade, ...prev]
+        );
+        break;
+      case "update":
+        setTrades((prev) => prev.map((t) => (t.id === change.trade.id ? change.trade : t)));
+        break;
+      case "delete":
+        setTrades((prev) => prev.filter((t) => t.id !== change.trade.id));
+        break;
+      case "reset":
+        // Missed changes can't be replayed; reload and resubscribe from the new snapshot
+        fetchTrades();
+        break;
+    }
+  };
+
   useEffect(() => {
     fetchTrades();
+    return () => {
+      syncIdRef.current++;
+      unsubscribeRef.current?.();
+      unsubscribeRef.current = null;
+    };
   }, []);
 
   return {
@@ -7,14 +7,12 @@ import { Textarea } from "@/components/ui/textarea";
 import { Button } from "@/components/ui/button";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { Dialog, DialogContent, DialogDescription, DialogHeader, DialogTitle } from "@/components/ui/dialog";
-import { useTrades } from "@/hooks/useTrades";
 import { TradeCreate, Trade } from "@/api/trades";
-import { createTrade } from "@/api/trades";
+import { createTrade, formatFeedback } from "@/api/trades";
 import { useToast } from "@/hooks/use-toast";
 
 export default function AddTrade() {
   const navigate = useNavigate();
-  const { fetchTrades } = useTrades();
   const { toast } = useToast();
   const [loading, setLoading] = useState(false);
   const [showAIFeedback, setShowAIFeedback] = useState(false);
@@ -49,9 +47,6 @@ export default function AddTrade() {
       const newTrade = await createTrade(tradeData);
       setCreatedTrade(newTrade);
       
-      // Refresh trades list
-      await fetchTrades();
-      
       toast({
         variant: "success",
         title: "Success",
@@ -59,7 +54,7 @@ export default function AddTrade() {
       });
 
       // Show AI feedback if available
-      if (newTrade.ai_feedback) {
+      if (formatFeedback(newTrade)) {
         setShowAIFeedback(true);
       }
       
@@ -270,11 +265,11 @@ export default function AddTrade() {
                 Your trade has been analyzed by AI
               </DialogDescription>
             </DialogHeader>
-            {createdTrade?.ai_feedback && (
+            {createdTrade && formatFeedback(createdTrade) && (
               <div className="mt-4 space-y-4">
                 <div className="bg-gradient-to-r from-neon-purple/20 to-neon-cyan/20 border border-neon-purple/50 p-4 rounded-lg">
                   <p className="text-sm whitespace-pre-wrap">
-                    {createdTrade.ai_feedback}
+                    {formatFeedback(createdTrade)}
                   </p>
                 </div>
                 <div className="flex justify-end gap-2">
@@ -7,13 +7,14 @@ import { EquityCurve } from "@/components/charts/EquityCurve";
 import { MonthlyPnL } from "@/components/charts/MonthlyPnL";
 import { Button } from "@/components/ui/button";
 import { useTrades } from "@/hooks/useTrades";
+import { feedbackSummary, PREVIEW_FEEDBACK_SECTIONS } from "@/api/trades";
 import { format } from "date-fns";
 import { TrendingUp, TrendingDown, Target, Calendar, ArrowRight, Sparkles } from "lucide-react";
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, Cell } from "recharts";
 
 export default function Dashboard() {
   const navigate = useNavigate();
-  const { trades, loading } = useTrades();
+  const { trades, loading } = useTrades(PREVIEW_FEEDBACK_SECTIONS);
 
   const stats = useMemo(() => {
     if (!trades.length) {
@@ -304,7 +305,7 @@ export default function Dashboard() {
                             <span className="mx-2">•</span>
                             <span>{format(new Date(trade.date), "MMM dd, yyyy")}</span>
                           </div>
-                          {trade.ai_feedback && (
+                          {feedbackSummary(trade) && (
                             <div className="mt-3 pt-3 border-t border-border/50">
                               <div className="flex items-start gap-2">
                                 <Sparkles className="h-4 w-4 text-neon-purple mt-0.5 flex-shrink-0" />
@@ -313,9 +314,9 @@ export default function Dashboard() {
                                     AI Feedback
                                   </p>
                                   <p className="text-sm text-muted-foreground line-clamp-2">
-                                    {trade.ai_feedback.length > 150
-                                      ? `${trade.ai_feedback.substring(0, 150)}...`
-                                      : trade.ai_feedback}
+                                    {feedbackSummary(trade)!.length > 150
+                                      ? `${feedbackSummary(trade)!.substring(0, 150)}...`
+                                      : feedbackSummary(trade)}
                                   </p>
                                 </div>
                               </div>
@@ -14,10 +14,11 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@
 import { useTrades, Trade } from "@/hooks/useTrades";
 import { format } from "date-fns";
 import { Search, Trash2, Edit2, X } from "lucide-react";
-import { TradeUpdate } from "@/api/trades";
+import { TradeUpdate, formatFeedback, PREVIEW_FEEDBACK_SECTIONS } from "@/api/trades";
+import { getFeedback } from "@/api/ai";
 
 export default function History() {
-  const { trades, loading, removeTrade, editTrade } = useTrades();
+  const { trades, loading, removeTrade, editTrade } = useTrades(PREVIEW_FEEDBACK_SECTIONS);
   const [selectedTrade, setSelectedTrade] = useState<Trade | null>(null);
   const [showDetailModal, setShowDetailModal] = useState(false);
   const [editingTrade, setEditingTrade] = useState<Trade | null>(null);
@@ -71,9 +72,19 @@ export default function History() {
     return pnl;
   };
 
-  const handleViewTrade = (trade: Trade) => {
+  const handleViewTrade = async (trade: Trade) => {
     setSelectedTrade(trade);
     setShowDetailModal(true);
+    // The list only carries the takeaways; load the full feedback for the detail view
+    if (!trade.ai_feedback_sections) return;
+    try {
+      const sections = await getFeedback(trade.id);
+      setSelectedTrade((prev) =>
+        prev?.id === trade.id ? { ...prev, ai_feedback_sections: sections } : prev
+      );
+    } catch (error) {
+      // Keep showing the takeaways already loaded
+    }
   };
 
   const handleEditTrade = (trade: Trade) => {
@@ -404,12 +415,12 @@ export default function History() {
                     </div>
                   )}
 
-                  {selectedTrade.ai_feedback && (
+                  {formatFeedback(selectedTrade) && (
                     <div>
                       <p className="text-sm text-muted-foreground mb-2">AI Feedback</p>
                       <div className="bg-gradient-to-r from-neon-purple/20 to-neon-cyan/20 border border-neon-purple/50 p-4 rounded-lg">
                         <p className="text-sm whitespace-pre-wrap">
-                          {selectedTrade.ai_feedback}
+                          {formatFeedback(selectedTrade)}
                         </p>
                       </div>
                     </div>
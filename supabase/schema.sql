@@ -15,3 +15,9 @@ create table if not exists trades (
   created_at timestamp default now()
 );
 
+
+-- Version id of the prompt template that produced ai_feedback
+alter table trades add column if not exists ai_feedback_version text;
+
+-- Structured AI feedback, one key per section (supersedes ai_feedback)
+alter table trades add column if not exists ai_feedback_sections jsonb;